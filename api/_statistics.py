@@ -0,0 +1,76 @@
+"""
+Helpers shared by the statistics handlers (statistics.py and site-statistics.py)
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import date, datetime, timedelta, timezone
+from _timing import timed
+
+# Upper bound on how long concurrent statistics queries may take
+STATS_QUERY_TIMEOUT_SECONDS = float(os.environ.get('STATS_QUERY_TIMEOUT_SECONDS', '8'))
+
+# At most this many Supabase requests are in flight at once
+MAX_CONCURRENT_QUERIES = 8
+
+# Rolling windows accepted as ?period=, in days including today
+PERIOD_DAYS = {'7d': 7, '30d': 30}
+
+# Months in which the spring, summer and fall semesters start
+SEMESTER_START_MONTHS = (1, 6, 8)
+
+def run_queries_concurrently(queries, timeout=STATS_QUERY_TIMEOUT_SECONDS, span='db'):
+    """Run independent queries in parallel.
+    
+    Returns (results, errors) keyed like `queries`. A query that raises or does not
+    finish within `timeout` seconds is reported in errors instead of results. The wait
+    is recorded as one `span` of the request, its wall-clock time rather than the sum of
+    the overlapping queries.
+    """
+    executor = ThreadPoolExecutor(max_workers=min(len(queries), MAX_CONCURRENT_QUERIES))
+    futures = {executor.submit(query): name for name, query in queries.items()}
+    with timed(span):
+        done, not_done = wait(futures, timeout=timeout)
+    
+    # Don't block the response on queries that timed out
+    executor.shutdown(wait=False)
+    
+    results = {}
+    errors = {}
+    for future in done:
+        name = futures[future]
+        try:
+            results[name] = future.result()
+        except Exception as e:
+            errors[name] = str(e)
+    for future in not_done:
+        errors[futures[future]] = f'Timed out after {timeout}s'
+    
+    return results, errors
+
+def parse_period(query_params, today=None):
+    """Resolve ?period=7d|30d|semester|custom to an inclusive (start, end) range of UTC dates.
+    
+    Custom periods take start and end as YYYY-MM-DD; the semester runs from its start to today.
+    """
+    period = query_params.get('period', [''])[0]
+    today = today or datetime.now(timezone.utc).date()
+    
+    if period in PERIOD_DAYS:
+        return today - timedelta(days=PERIOD_DAYS[period] - 1), today
+    
+    if period == 'semester':
+        start_month = max(month for month in SEMESTER_START_MONTHS if month <= today.month)
+        return today.replace(month=start_month, day=1), today
+    
+    if period == 'custom':
+        try:
+            start = date.fromisoformat(query_params.get('start', [''])[0])
+            end = date.fromisoformat(query_params.get('end', [''])[0])
+        except ValueError:
+            raise ValueError('Custom periods need start and end dates as YYYY-MM-DD')
+        if start > end:
+            raise ValueError('Period start must not be after its end')
+        return start, end
+    
+    raise ValueError(f"Invalid period. Must be one of: {list(PERIOD_DAYS) + ['semester', 'custom']}")
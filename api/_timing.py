@@ -0,0 +1,107 @@
+"""
+Request timing shared by the API handlers
+Each request collects per-phase spans (parse, db-*, compute, serialize, and init on a
+cold start) and reports them as a Server-Timing header and one JSON log line.
+"""
+
+import os
+import json
+import time
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import urlparse
+
+# Log one structured timing line per request; REQUEST_TIMING_LOGS=false turns it off
+REQUEST_TIMING_LOGS = os.environ.get('REQUEST_TIMING_LOGS', 'true').lower() != 'false'
+
+# Spans of the request being handled on this thread
+_request_local = threading.local()
+
+# Handler module setup time, reported once as the 'init' span of the instance's first request
+_cold_start_ms = None
+_cold_start_lock = threading.Lock()
+
+def record_cold_start(module_started):
+    """Remember how long the handler module took to set up, for its first request to report"""
+    global _cold_start_ms
+    _cold_start_ms = (time.perf_counter() - module_started) * 1000
+
+class Timings:
+    """Per-phase spans of one request, reported as a Server-Timing header and a JSON log line"""
+    
+    def __init__(self):
+        global _cold_start_ms
+        self.started = time.perf_counter()
+        self.spans = {}
+        self.lock = threading.Lock()
+        
+        # The first request an instance serves also reports how long module setup took
+        with _cold_start_lock:
+            cold_start_ms, _cold_start_ms = _cold_start_ms, None
+        self.cold_start = cold_start_ms is not None
+        if self.cold_start:
+            self.add('init', cold_start_ms)
+    
+    def add(self, name, duration_ms):
+        """Add to a span; repeated phases such as paged queries accumulate"""
+        with self.lock:
+            self.spans[name] = self.spans.get(name, 0.0) + duration_ms
+    
+    def report(self, method, path, status_code):
+        """Log the spans and return them as a Server-Timing header value"""
+        with self.lock:
+            spans = dict(self.spans, total=(time.perf_counter() - self.started) * 1000)
+        
+        if REQUEST_TIMING_LOGS:
+            print(json.dumps({
+                'type': 'timing',
+                'method': method,
+                'path': urlparse(path).path,
+                'status': status_code,
+                'cold_start': self.cold_start,
+                'spans_ms': {name: round(duration_ms, 1) for name, duration_ms in spans.items()}
+            }))
+        
+        return ', '.join(f'{name};dur={duration_ms:.1f}' for name, duration_ms in spans.items())
+
+@contextmanager
+def timed(name):
+    """Record how long the block takes as a span of the current request, if there is one.
+    
+    Only the thread handling the request records spans. Work fanned out to other threads
+    is timed by the caller as the wall-clock span it waits for, since per-thread spans
+    overlap and summing them would overstate the time spent.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings = getattr(_request_local, 'timings', None)
+        if timings is not None:
+            timings.add(name, (time.perf_counter() - started) * 1000)
+
+class TimedRequestHandler(BaseHTTPRequestHandler):
+    """Request handler that times each request and adds Server-Timing to every response"""
+    
+    timings = None
+    status_code = None
+    
+    def parse_request(self):
+        """Start timing the request as soon as its request line and headers are read"""
+        self.timings = _request_local.timings = Timings()
+        self.status_code = None
+        with timed('parse'):
+            return super().parse_request()
+    
+    def send_response(self, code, message=None):
+        """Remember the status code for the timing log"""
+        self.status_code = code
+        super().send_response(code, message)
+    
+    def end_headers(self):
+        """Add Server-Timing to every response, including errors sent before the request line was parsed"""
+        timings = self.timings or Timings()
+        self.send_header('Server-Timing', timings.report(getattr(self, 'command', None), getattr(self, 'path', ''), self.status_code))
+        self.send_header('Timing-Allow-Origin', '*')
+        super().end_headers()
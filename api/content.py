@@ -3,12 +3,30 @@ Content Management API endpoint for Vercel
 Handles CRUD operations for content using Supabase
 """
 
+# Start of module setup, before the heavy imports, for the cold-start span
+import time
+_module_started = time.perf_counter()
+
 import os
+import sys
+import re
 import json
-from http.server import BaseHTTPRequestHandler
+import gzip
+import base64
+import hashlib
+from datetime import datetime, timedelta, timezone
 from urllib.parse import urlparse, parse_qs
 from supabase import create_client, Client
 
+# Shared helpers (api/_*.py) live next to this handler
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _timing import TimedRequestHandler, record_cold_start, timed
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
 # Initialize Supabase client
 supabase_url = os.environ.get('VITE_SUPABASE_URL', 'https://gzzbjifmrwvqbkwbyvhm.supabase.co')
 supabase_key = os.environ.get('SUPABASE_SERVICE_ROLE_KEY', os.environ.get('VITE_SUPABASE_SERVICE_ROLE_KEY', ''))
@@ -19,42 +37,693 @@ if not supabase_key:
 
 supabase: Client = create_client(supabase_url, supabase_key)
 
-class handler(BaseHTTPRequestHandler):
+# How long a snapshot is served before the content version is re-checked
+CONTENT_VERSION_TTL_SECONDS = float(os.environ.get('CONTENT_VERSION_TTL_SECONDS', '30'))
+
+# Page size limits for paginated content queries
+DEFAULT_PAGE_SIZE = 200
+MAX_PAGE_SIZE = 1000
+
+# Keyset ordering for content rows; language_code breaks ties between translations
+CONTENT_ORDER_COLUMNS = ['page', 'section', 'key', 'language_code']
+
+# Query parameters that are pushed down into the Supabase query as equality filters
+CONTENT_FILTER_PARAMS = ['page', 'section', 'language_code']
+
+# Batch writes: natural key used for upserts and the maximum operations per request
+CONTENT_CONFLICT_COLUMNS = 'page,section,key,language_code'
+MAX_BATCH_OPERATIONS = 500
+
+# Tombstones are kept this long; older since= values get a full resync instead of a delta
+TOMBSTONE_RETENTION_DAYS = 30
+
+# Delta queries re-send rows this close to the watermark to cover transactions that commit late
+DELTA_OVERLAP_SECONDS = 5
+
+# Language every locale chain falls back to
+DEFAULT_LANGUAGE = 'en'
+
+# Upper bound on cached bundles and resolved locale chains, since both are keyed by client input
+MAX_CACHED_VARIANTS = 64
+
+# Pre-built page bundles keyed by (page, locale chain), tied to the snapshot they were built from
+_content_bundles = {}
+
+# (page, section, key) -> {language_code: value}, plus resolved trees per locale chain
+_translation_index = {
+    'snapshot_etag': None,
+    'values': {},
+    'resolved': {}
+}
+
+# Static snapshot exported at deploy time by scripts/export-content-snapshot.js
+CONTENT_SNAPSHOT_PATH = os.environ.get(
+    'CONTENT_SNAPSHOT_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'content', 'content-snapshot.json')
+)
+
+# Module-level snapshot of the content table, reused across warm invocations
+_content_snapshot = {
+    'version': None,
+    'etag': None,
+    'body': None,
+    'rows': None,
+    'updated_through': None,
+    'checked_at': 0.0,
+    'static_loaded': False
+}
+
+def get_content_version():
+    """Fetch the content version (latest updated_at and row count) in one round-trip"""
+    with timed('db-version'):
+        response = supabase.table('content').select('updated_at', count='exact').order('updated_at', desc=True).limit(1).execute()
+    latest_update = response.data[0]['updated_at'] if response.data else None
+    return f"{latest_update}:{response.count or 0}"
+
+def load_static_snapshot():
+    """Load the deploy-time content snapshot, or None if it was not generated"""
+    try:
+        with open(CONTENT_SNAPSHOT_PATH) as snapshot_file:
+            static = json.load(snapshot_file)
+    except (OSError, ValueError):
+        return None
+    
+    if not isinstance(static, dict) or not isinstance(static.get('data'), list):
+        return None
+    return static
+
+def store_content_snapshot(rows, version, updated_through):
+    """Serialize rows into the module-level snapshot"""
+    with timed('serialize'):
+        body = json.dumps({
+            'success': True,
+            'version': updated_through,
+            'data': rows
+        }).encode()
+    
+    _content_snapshot['version'] = version
+    _content_snapshot['rows'] = rows
+    _content_snapshot['updated_through'] = updated_through
+    _content_snapshot['body'] = body
+    _content_snapshot['etag'] = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+def merge_content_delta(snapshot, expected_count):
+    """Bring snapshot rows up to date from the delta since its watermark.
+    
+    Returns (rows, updated_through), or None when a full reload is needed instead.
+    """
+    if snapshot['rows'] is None or not snapshot['updated_through']:
+        return None
+    
+    since = parse_timestamp(snapshot['updated_through'])
+    if since < datetime.now(timezone.utc) - timedelta(days=TOMBSTONE_RETENTION_DAYS):
+        return None
+    
+    changed_rows, deleted_rows = fetch_content_delta(since)
+    
+    with timed('compute'):
+        rows_by_id = {row['id']: row for row in snapshot['rows']}
+        for tombstone in deleted_rows:
+            rows_by_id.pop(tombstone['id'], None)
+        for row in changed_rows:
+            rows_by_id[row['id']] = row
+    
+    # The row count is part of the version, so a mismatch means the delta missed something
+    if len(rows_by_id) != expected_count:
+        return None
+    
+    rows = sorted(rows_by_id.values(), key=lambda row: (row['page'], row['section'], row['key']))
+    updated_through = latest_timestamp(
+        [snapshot['updated_through']]
+        + [row['updated_at'] for row in changed_rows]
+        + [tombstone['deleted_at'] for tombstone in deleted_rows]
+    )
+    return rows, updated_through
+
+def get_content_snapshot():
+    """Return the cached content snapshot, rebuilding it only when the content version changes"""
+    now = time.monotonic()
+    snapshot = _content_snapshot
+    
+    # On a cold start, serve the deploy-time snapshot without touching the database
+    if snapshot['body'] is None and not snapshot['static_loaded']:
+        snapshot['static_loaded'] = True
+        static = load_static_snapshot()
+        if static is not None:
+            store_content_snapshot(static['data'], f"{static.get('version')}:{len(static['data'])}", static.get('version'))
+            snapshot['checked_at'] = now
+            return snapshot
+    
+    if snapshot['body'] is not None and now - snapshot['checked_at'] < CONTENT_VERSION_TTL_SECONDS:
+        return snapshot
+    
+    version = get_content_version()
+    if snapshot['body'] is None or version != snapshot['version']:
+        merged = None
+        if snapshot['body'] is not None:
+            # Only fetch the rows that changed since the snapshot was taken
+            merged = merge_content_delta(snapshot, int(version.rsplit(':', 1)[1]))
+        
+        if merged is not None:
+            rows, updated_through = merged
+        else:
+            with timed('db-content'):
+                response = supabase.table('content').select('*').order('page').order('section').order('key').execute()
+            rows = response.data or []
+            updated_through = latest_timestamp(row['updated_at'] for row in rows)
+        
+        store_content_snapshot(rows, version, updated_through)
+    
+    snapshot['checked_at'] = now
+    return snapshot
+
+def invalidate_content_snapshot():
+    """Mark the cached snapshot stale so the next GET re-checks the content version"""
+    _content_bundles.clear()
+    _content_snapshot['version'] = None
+    _content_snapshot['checked_at'] = 0.0
+
+def etag_matches(if_none_match, etag):
+    """Check an If-None-Match header against an ETag (weak comparison, as RFC 7232 requires)"""
+    if not if_none_match or not etag:
+        return False
+    
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate == '*':
+            return True
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+def encode_cursor(row):
+    """Encode the keyset position of a row as an opaque cursor"""
+    position = [row[column] for column in CONTENT_ORDER_COLUMNS]
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """Decode a cursor produced by encode_cursor"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError('Invalid cursor')
+    
+    if not isinstance(position, list) or len(position) != len(CONTENT_ORDER_COLUMNS):
+        raise ValueError('Invalid cursor')
+    return position
+
+def quote_filter_value(value):
+    """Quote a value for use inside a PostgREST or=(...) filter"""
+    escaped = str(value).replace('\\', '\\\\').replace('"', '\\"')
+    return f'"{escaped}"'
+
+def build_keyset_filter(position):
+    """Build a PostgREST or-filter selecting rows strictly after the given keyset position"""
+    clauses = []
+    for index, column in enumerate(CONTENT_ORDER_COLUMNS):
+        conditions = [
+            f'{CONTENT_ORDER_COLUMNS[i]}.eq.{quote_filter_value(position[i])}'
+            for i in range(index)
+        ]
+        conditions.append(f'{column}.gt.{quote_filter_value(position[index])}')
+        
+        if len(conditions) == 1:
+            clauses.append(conditions[0])
+        else:
+            clauses.append(f"and({','.join(conditions)})")
+    return ','.join(clauses)
+
+def parse_content_query(query_params):
+    """Extract filters and pagination settings from GET query parameters"""
+    filters = {}
+    for param in CONTENT_FILTER_PARAMS:
+        value = query_params.get(param, [None])[0]
+        if value:
+            filters[param] = value
+    
+    keys = []
+    for raw_keys in query_params.get('keys', []):
+        keys.extend(key.strip() for key in raw_keys.split(',') if key.strip())
+    
+    limit = query_params.get('limit', [None])[0]
+    cursor = query_params.get('cursor', [None])[0]
+    
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise ValueError('limit must be a valid integer')
+        if limit < 1 or limit > MAX_PAGE_SIZE:
+            raise ValueError(f'limit must be between 1 and {MAX_PAGE_SIZE}')
+    elif cursor:
+        limit = DEFAULT_PAGE_SIZE
+    
+    return {
+        'filters': filters,
+        'keys': keys,
+        'limit': limit,
+        'position': decode_cursor(cursor) if cursor else None
+    }
+
+def query_content(filters, keys=None, limit=None, position=None):
+    """Run a filtered, keyset-paginated content query in Supabase"""
+    query = supabase.table('content').select('*')
+    
+    for column, value in filters.items():
+        query = query.eq(column, value)
+    if keys:
+        query = query.in_('key', keys)
+    if position is not None:
+        query = query.or_(build_keyset_filter(position))
+    
+    for column in CONTENT_ORDER_COLUMNS:
+        query = query.order(column)
+    
+    # Fetch one extra row to know whether another page exists
+    if limit is not None:
+        query = query.limit(limit + 1)
+    
+    with timed('db-content'):
+        response = query.execute()
+    rows = response.data or []
+    
+    result = {
+        'success': True,
+        'data': rows
+    }
+    
+    if limit is not None:
+        has_more = len(rows) > limit
+        result['data'] = rows[:limit]
+        result['next_cursor'] = encode_cursor(rows[limit - 1]) if has_more else None
+    
+    return result
+
+def natural_key(row):
+    """Return the (page, section, key, language_code) identity of a content row"""
+    return (row['page'], row['section'], row['key'], row['language_code'])
+
+def apply_content_batch(operations):
+    """Apply create/update/delete operations with one upsert and one delete call.
+    
+    Returns one result per operation, in request order.
+    """
+    results = [None] * len(operations)
+    upserts = []   # (index, row)
+    id_updates = []  # (index, id, value)
+    deletes = []   # (index, id)
+    
+    # Validate each operation and sort it into upserts or deletes
+    for index, operation in enumerate(operations):
+        if not isinstance(operation, dict):
+            results[index] = {'index': index, 'success': False, 'error': 'Operation must be an object'}
+            continue
+        
+        op = operation.get('op')
+        if op == 'delete':
+            if not operation.get('id'):
+                results[index] = {'index': index, 'op': op, 'success': False, 'error': 'Missing required field: id'}
+                continue
+            deletes.append((index, operation['id']))
+        elif op in ('create', 'update'):
+            if 'value' not in operation:
+                results[index] = {'index': index, 'op': op, 'success': False, 'error': 'Missing required field: value'}
+                continue
+            
+            missing = [field for field in ('page', 'section', 'key') if field not in operation]
+            if not missing:
+                # content.language_code is NOT NULL; one null row would fail the whole upsert
+                if operation.get('language_code', 'en') is None:
+                    results[index] = {'index': index, 'op': op, 'success': False, 'error': 'language_code must not be null'}
+                    continue
+                upserts.append((index, {
+                    'page': operation['page'],
+                    'section': operation['section'],
+                    'key': operation['key'],
+                    'value': operation['value'],
+                    'language_code': operation.get('language_code', 'en')
+                }))
+            elif op == 'update' and operation.get('id'):
+                id_updates.append((index, operation['id'], operation['value']))
+            else:
+                results[index] = {'index': index, 'op': op, 'success': False, 'error': f'Missing required field: {missing[0]}'}
+        else:
+            results[index] = {'index': index, 'op': op, 'success': False, 'error': 'op must be one of: create, update, delete'}
+    
+    # Resolve id-only updates to their natural keys so they can join the upsert
+    if id_updates:
+        try:
+            ids = [content_id for _, content_id, _ in id_updates]
+            with timed('db-content'):
+                response = supabase.table('content').select('id, page, section, key, language_code').in_('id', ids).execute()
+            rows_by_id = {str(row['id']): row for row in response.data or []}
+        except Exception as e:
+            rows_by_id = {}
+            for index, _, _ in id_updates:
+                results[index] = {'index': index, 'op': 'update', 'success': False, 'error': str(e)}
+        
+        for index, content_id, value in id_updates:
+            # Already failed with the lookup
+            if results[index]:
+                continue
+            
+            row = rows_by_id.get(str(content_id))
+            if not row:
+                results[index] = {'index': index, 'op': 'update', 'success': False, 'error': 'Content not found'}
+                continue
+            
+            upserts.append((index, {
+                'page': row['page'],
+                'section': row['section'],
+                'key': row['key'],
+                'value': value,
+                'language_code': row['language_code']
+            }))
+    
+    # A single upsert cannot touch the same row twice
+    pending_upserts = {}
+    for index, row in sorted(upserts):
+        key = natural_key(row)
+        if key in pending_upserts:
+            results[index] = {'index': index, 'op': operations[index]['op'], 'success': False, 'error': f'Duplicate operation for {".".join(key[:3])} ({key[3]})'}
+            continue
+        pending_upserts[key] = (index, row)
+    
+    if pending_upserts:
+        try:
+            with timed('db-content'):
+                response = supabase.table('content').upsert(
+                    [row for _, row in pending_upserts.values()],
+                    on_conflict=CONTENT_CONFLICT_COLUMNS
+                ).execute()
+            saved_rows = {natural_key(row): row for row in response.data or []}
+            
+            for key, (index, _) in pending_upserts.items():
+                saved = saved_rows.get(key)
+                results[index] = {'index': index, 'op': operations[index]['op'], 'success': saved is not None, 'data': saved}
+        except Exception as e:
+            for index, _ in pending_upserts.values():
+                results[index] = {'index': index, 'op': operations[index]['op'], 'success': False, 'error': str(e)}
+    
+    if deletes:
+        try:
+            with timed('db-content'):
+                response = supabase.table('content').delete().in_('id', [content_id for _, content_id in deletes]).execute()
+            deleted_ids = {str(row['id']) for row in response.data or []}
+            
+            for index, content_id in deletes:
+                if str(content_id) in deleted_ids:
+                    results[index] = {'index': index, 'op': 'delete', 'success': True, 'id': content_id}
+                else:
+                    results[index] = {'index': index, 'op': 'delete', 'success': False, 'id': content_id, 'error': 'Content not found'}
+        except Exception as e:
+            for index, content_id in deletes:
+                results[index] = {'index': index, 'op': 'delete', 'success': False, 'id': content_id, 'error': str(e)}
+    
+    return results
+
+def parse_timestamp(value):
+    """Parse an ISO 8601 timestamp as returned by Supabase, assuming UTC when no offset is given"""
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed
+
+def latest_timestamp(values):
+    """Return the latest of several ISO 8601 timestamps, or None if there are none"""
+    latest = None
+    for value in values:
+        if value and (latest is None or parse_timestamp(value) > parse_timestamp(latest)):
+            latest = value
+    return latest
+
+def fetch_content_delta(since):
+    """Fetch rows updated and tombstones recorded after `since` (minus a small overlap)"""
+    lower_bound = (since - timedelta(seconds=DELTA_OVERLAP_SECONDS)).isoformat()
+    
+    with timed('db-delta'):
+        changed = supabase.table('content').select('*').gte('updated_at', lower_bound).order('updated_at').execute()
+        deleted = supabase.table('content_tombstones').select('id, page, section, key, language_code, deleted_at').gte('deleted_at', lower_bound).order('deleted_at').execute()
+    
+    return changed.data or [], deleted.data or []
+
+def get_content_changes(since):
+    """Return rows created or updated after `since`, plus tombstones for rows deleted since then"""
+    if since < datetime.now(timezone.utc) - timedelta(days=TOMBSTONE_RETENTION_DAYS):
+        # Tombstones that old may have been pruned, so a delta could miss deletes
+        snapshot = get_content_snapshot()
+        return {
+            'success': True,
+            'full_resync': True,
+            'version': snapshot['updated_through'],
+            'data': snapshot['rows'] or [],
+            'deleted': []
+        }
+    
+    changed_rows, deleted_rows = fetch_content_delta(since)
+    
+    version = latest_timestamp(
+        [since.isoformat()]
+        + [row['updated_at'] for row in changed_rows]
+        + [row['deleted_at'] for row in deleted_rows]
+    )
+    
+    return {
+        'success': True,
+        'full_resync': False,
+        'version': version,
+        'data': changed_rows,
+        'deleted': deleted_rows
+    }
+
+def normalize_language(language_code):
+    """Normalize a language tag for comparison (es_MX, es-mx and es-MX are the same)"""
+    return (language_code or DEFAULT_LANGUAGE).strip().replace('_', '-').lower()
+
+def locale_chain(locale):
+    """Expand a locale (or comma-separated preference list) into its fallback chain.
+    
+    'es-MX' -> ('es-mx', 'es', 'en'); 'fr-CA,es' -> ('fr-ca', 'fr', 'es', 'en')
+    """
+    chain = []
+    for preference in (locale or '').split(','):
+        if not preference.strip():
+            continue
+        subtags = normalize_language(preference).split('-')
+        for length in range(len(subtags), 0, -1):
+            candidate = '-'.join(subtags[:length])
+            if candidate and candidate not in chain:
+                chain.append(candidate)
+    
+    if DEFAULT_LANGUAGE not in chain:
+        chain.append(DEFAULT_LANGUAGE)
+    return tuple(chain)
+
+def get_translation_index():
+    """Return the translation index, rebuilding it only when the snapshot changes"""
+    snapshot = get_content_snapshot()
+    
+    if _translation_index['snapshot_etag'] != snapshot['etag']:
+        with timed('compute'):
+            values = {}
+            for row in snapshot['rows'] or []:
+                translations = values.setdefault((row['page'], row['section'], row['key']), {})
+                translations[normalize_language(row.get('language_code'))] = row['value']
+        
+        _translation_index['snapshot_etag'] = snapshot['etag']
+        _translation_index['values'] = values
+        _translation_index['resolved'] = {}
+    return _translation_index
+
+def resolve_content(chain):
+    """Return page -> section -> key -> best-available value for a locale chain"""
+    index = get_translation_index()
+    
+    resolved = index['resolved'].get(chain)
+    if resolved is None:
+        with timed('compute'):
+            resolved = {}
+            for (page, section, key), translations in index['values'].items():
+                for language_code in chain:
+                    if language_code in translations:
+                        resolved.setdefault(page, {}).setdefault(section, {})[key] = translations[language_code]
+                        break
+        
+        if len(index['resolved']) >= MAX_CACHED_VARIANTS:
+            index['resolved'].clear()
+        index['resolved'][chain] = resolved
+    return resolved
+
+def build_content_bundle(sections, page, chain):
+    """Build the pre-serialized and pre-compressed section->key->value bundle for one page"""
+    with timed('serialize'):
+        body = json.dumps({
+            'success': True,
+            'page': page,
+            'language_code': chain[0],
+            'locale_chain': list(chain),
+            'data': sections
+        }, separators=(',', ':')).encode()
+        digest = hashlib.sha256(body).hexdigest()[:32]
+    
+    with timed('compress'):
+        encodings = {
+            'identity': (body, f'"{digest}"'),
+            'gzip': (gzip.compress(body, compresslevel=9, mtime=0), f'"{digest}-gzip"')
+        }
+        if brotli is not None:
+            encodings['br'] = (brotli.compress(body, quality=11), f'"{digest}-br"')
+    return encodings
+
+def get_content_bundle(page, locale):
+    """Return the bundle for a page and locale, rebuilding it only when the snapshot changes"""
+    chain = locale_chain(locale)
+    resolved = resolve_content(chain)
+    snapshot_etag = _translation_index['snapshot_etag']
+    cache_key = (page, chain)
+    
+    cached = _content_bundles.get(cache_key)
+    if cached is None or cached['snapshot_etag'] != snapshot_etag:
+        if len(_content_bundles) >= MAX_CACHED_VARIANTS:
+            _content_bundles.clear()
+        cached = {
+            'snapshot_etag': snapshot_etag,
+            'encodings': build_content_bundle(resolved.get(page, {}), page, chain)
+        }
+        _content_bundles[cache_key] = cached
+    return cached['encodings']
+
+def choose_encoding(accept_encoding, available):
+    """Pick the best available content coding from an Accept-Encoding header"""
+    accepted = {}
+    for part in (accept_encoding or '').split(','):
+        name, _, params = part.strip().partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name] = quality
+    
+    for encoding in ('br', 'gzip'):
+        quality = accepted.get(encoding, accepted.get('*', 0.0))
+        if encoding in available and quality > 0:
+            return encoding
+    return 'identity'
+
+class handler(TimedRequestHandler):
     def do_OPTIONS(self):
         """Handle preflight CORS requests"""
         self.send_response(200)
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Access-Control-Allow-Methods', 'GET, POST, PUT, DELETE, OPTIONS')
-        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type, If-None-Match')
+        self.send_header('Access-Control-Expose-Headers', 'ETag')
         self.end_headers()
         
     def do_GET(self):
-        """Get all content"""
+        """Get content, optionally filtered by page/section/language_code/keys and paginated"""
         try:
-            # Query content from Supabase
-            response = supabase.table('content').select('*').order('page').order('section').order('key').execute()
+            with timed('parse'):
+                query_params = parse_qs(urlparse(self.path).query)
             
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.end_headers()
+            content_encoding = None
             
-            result = {
-                'success': True,
-                'data': response.data
-            }
-            self.wfile.write(json.dumps(result).encode())
+            since = query_params.get('since', [None])[0]
+            bundle_page = query_params.get('bundle', [None])[0]
+            locale = query_params.get('locale', [None])[0]
+            
+            if since:
+                # Delta sync: only what changed after the client's version
+                # An unencoded "+00:00" offset arrives as " 00:00"
+                since = re.sub(r' (\d{2}:?\d{2})$', r'+\1', since)
+                try:
+                    since = parse_timestamp(since)
+                except ValueError:
+                    self.send_error_response(400, 'since must be an ISO 8601 timestamp or a version returned by this API')
+                    return
+                
+                changes = get_content_changes(since)
+                with timed('serialize'):
+                    body = json.dumps(changes).encode()
+                    etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+            elif bundle_page:
+                # Serve a pre-built, pre-compressed page bundle resolved for the requested locale
+                language_code = query_params.get('lang', query_params.get('language_code', [DEFAULT_LANGUAGE]))[0]
+                encodings = get_content_bundle(bundle_page, language_code)
+                content_encoding = choose_encoding(self.headers.get('Accept-Encoding'), encodings)
+                body, etag = encodings[content_encoding]
+            elif locale:
+                # Every page resolved to one value per key for the locale's fallback chain
+                chain = locale_chain(locale)
+                resolved = resolve_content(chain)
+                
+                page = query_params.get('page', [None])[0]
+                if page:
+                    resolved = {page: resolved.get(page, {})}
+                
+                with timed('serialize'):
+                    body = json.dumps({
+                        'success': True,
+                        'locale_chain': list(chain),
+                        'data': resolved
+                    }, separators=(',', ':')).encode()
+                    etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+            else:
+                try:
+                    with timed('parse'):
+                        content_query = parse_content_query(query_params)
+                except ValueError as e:
+                    self.send_error_response(400, str(e))
+                    return
+                
+                is_full_listing = (
+                    not content_query['filters']
+                    and not content_query['keys']
+                    and content_query['limit'] is None
+                )
+                
+                if is_full_listing:
+                    # Serve the whole table from the cached snapshot
+                    snapshot = get_content_snapshot()
+                    body = snapshot['body']
+                    etag = snapshot['etag']
+                else:
+                    # Push filters and pagination down into Supabase
+                    result = query_content(
+                        content_query['filters'],
+                        keys=content_query['keys'],
+                        limit=content_query['limit'],
+                        position=content_query['position']
+                    )
+                    with timed('serialize'):
+                        body = json.dumps(result).encode()
+                        etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+            
+            self.send_json_body(body, etag, content_encoding)
             
         except Exception as e:
             self.send_error_response(500, str(e))
     
     def do_POST(self):
-        """Create new content"""
+        """Create new content, or apply a batch of operations"""
         try:
             content_length = int(self.headers.get('Content-Length', 0))
             body = self.rfile.read(content_length)
             data = json.loads(body.decode())
             
+            if 'operations' in data:
+                self.handle_batch(data['operations'])
+                return
+            
             # Validate required fields
             required_fields = ['page', 'section', 'key', 'value']
             for field in required_fields:
@@ -71,18 +740,24 @@ class handler(BaseHTTPRequestHandler):
                 'language_code': data.get('language_code', 'en')
             }
             
-            response = supabase.table('content').insert(new_content).execute()
+            with timed('db-content'):
+                response = supabase.table('content').insert(new_content).execute()
+            invalidate_content_snapshot()
+            
+            result = {
+                'success': True,
+                'data': response.data[0] if response.data else None
+            }
+            
+            with timed('serialize'):
+                body = json.dumps(result).encode()
             
             self.send_response(201)
             self.send_header('Content-Type', 'application/json')
             self.send_header('Access-Control-Allow-Origin', '*')
             self.end_headers()
             
-            result = {
-                'success': True,
-                'data': response.data[0] if response.data else None
-            }
-            self.wfile.write(json.dumps(result).encode())
+            self.wfile.write(body)
             
         except Exception as e:
             self.send_error_response(500, str(e))
@@ -100,22 +775,28 @@ class handler(BaseHTTPRequestHandler):
                 return
             
             # Update in Supabase
-            response = supabase.table('content').update({'value': data['value']}).eq('id', data['id']).execute()
+            with timed('db-content'):
+                response = supabase.table('content').update({'value': data['value']}).eq('id', data['id']).execute()
+            invalidate_content_snapshot()
             
             if not response.data:
                 self.send_error_response(404, 'Content not found')
                 return
             
+            result = {
+                'success': True,
+                'data': response.data[0] if response.data else None
+            }
+            
+            with timed('serialize'):
+                body = json.dumps(result).encode()
+            
             self.send_response(200)
             self.send_header('Content-Type', 'application/json')
             self.send_header('Access-Control-Allow-Origin', '*')
             self.end_headers()
             
-            result = {
-                'success': True,
-                'data': response.data[0] if response.data else None
-            }
-            self.wfile.write(json.dumps(result).encode())
+            self.wfile.write(body)
             
         except Exception as e:
             self.send_error_response(500, str(e))
@@ -133,7 +814,9 @@ class handler(BaseHTTPRequestHandler):
                 return
             
             # Delete from Supabase
-            response = supabase.table('content').delete().eq('id', content_id).execute()
+            with timed('db-content'):
+                response = supabase.table('content').delete().eq('id', content_id).execute()
+            invalidate_content_snapshot()
             
             self.send_response(200)
             self.send_header('Content-Type', 'application/json')
@@ -146,6 +829,58 @@ class handler(BaseHTTPRequestHandler):
         except Exception as e:
             self.send_error_response(500, str(e))
     
+    def handle_batch(self, operations):
+        """Apply a batch of create/update/delete operations and report per-item results"""
+        if not isinstance(operations, list) or not operations:
+            self.send_error_response(400, 'operations must be a non-empty array')
+            return
+        
+        if len(operations) > MAX_BATCH_OPERATIONS:
+            self.send_error_response(400, f'Too many operations. Maximum is {MAX_BATCH_OPERATIONS}')
+            return
+        
+        results = apply_content_batch(operations)
+        invalidate_content_snapshot()
+        
+        result = {
+            'success': all(item['success'] for item in results),
+            'results': results
+        }
+        
+        with timed('serialize'):
+            body = json.dumps(result).encode()
+        
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        
+        self.wfile.write(body)
+    
+    def send_json_body(self, body, etag, content_encoding=None):
+        """Send a pre-serialized JSON body with its ETag, or 304 if the client already has it"""
+        not_modified = etag_matches(self.headers.get('If-None-Match'), etag)
+        
+        if not_modified:
+            self.send_response(304)
+        else:
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            if content_encoding and content_encoding != 'identity':
+                self.send_header('Content-Encoding', content_encoding)
+        
+        if content_encoding:
+            self.send_header('Vary', 'Accept-Encoding')
+        self.send_header('ETag', etag)
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Expose-Headers', 'ETag, Server-Timing')
+        self.end_headers()
+        
+        if not not_modified:
+            self.wfile.write(body)
+    
     def send_error_response(self, status_code, error_message):
         """Send error response"""
         self.send_response(status_code)
@@ -157,4 +892,7 @@ class handler(BaseHTTPRequestHandler):
             'success': False,
             'error': error_message
         }
-        self.wfile.write(json.dumps(result).encode())
\ No newline at end of file
+        self.wfile.write(json.dumps(result).encode())
+
+# Module setup time, reported once as the 'init' span of this instance's first request
+record_cold_start(_module_started)
@@ -3,13 +3,24 @@ Site Statistics API endpoint for Vercel
 Handles automatic calculation and manual override of site statistics
 """
 
+# Start of module setup, before the heavy imports, for the cold-start span
+import time
+_module_started = time.perf_counter()
+
 import os
+import sys
 import json
 import datetime
-from http.server import BaseHTTPRequestHandler
+import uuid
+from collections import Counter
 from urllib.parse import urlparse, parse_qs
 from supabase import create_client, Client
 
+# Shared helpers (api/_*.py) live next to this handler
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _timing import TimedRequestHandler, record_cold_start, timed
+from _statistics import STATS_QUERY_TIMEOUT_SECONDS, parse_period, run_queries_concurrently
+
 # Initialize Supabase client
 supabase_url = os.environ.get('VITE_SUPABASE_URL', 'https://gzzbjifmrwvqbkwbyvhm.supabase.co')
 supabase_key = os.environ.get('SUPABASE_SERVICE_ROLE_KEY', os.environ.get('VITE_SUPABASE_SERVICE_ROLE_KEY', ''))
@@ -20,7 +31,169 @@ if not supabase_key:
 
 supabase: Client = create_client(supabase_url, supabase_key)
 
-class handler(BaseHTTPRequestHandler):
+# Rows per page when scanning a table; matches PostgREST's default max-rows on Supabase
+SCAN_PAGE_SIZE = 1000
+
+# Ids per in_() request: 100 UUIDs make a URL of about 4 KB, half the 8 KB many proxies accept
+IN_CHUNK_SIZE = 100
+
+# Budget for calculating statistics by scanning tables page by page; scans stop once it is spent
+STATS_SCAN_TIMEOUT_SECONDS = float(os.environ.get('STATS_SCAN_TIMEOUT_SECONDS', '20'))
+
+# Breakdowns accepted as ?breakdown= and the columns they can be sorted by with ?sort=
+BREAKDOWN_GROUPS = ['organization', 'event']
+BREAKDOWN_SORTS = ['signups', 'hours', 'volunteers']
+
+# Rows returned by a breakdown unless ?limit= asks for another number (up to the maximum)
+DEFAULT_BREAKDOWN_LIMIT = 10
+MAX_BREAKDOWN_LIMIT = 100
+
+# Print calculation details; off by default so results are not dumped on every request
+STATS_DEBUG = os.environ.get('STATS_DEBUG', 'false').lower() == 'true'
+
+def iter_table_rows(table, columns, key='id', page_size=SCAN_PAGE_SIZE, deadline=None):
+    """Yield every row of a table, one page at a time.
+    
+    Pages are keyset-paginated on `key` (which must be among `columns`), so scans are
+    not silently cut off at PostgREST's row limit and only one page is held in memory.
+    Once time.monotonic() passes `deadline`, no more pages are fetched and TimeoutError
+    is raised, so a scan its caller has given up on does not keep querying.
+    """
+    last_key = None
+    while True:
+        if deadline is not None and time.monotonic() >= deadline:
+            raise TimeoutError(f'Scanning {table} ran out of time')
+        
+        query = supabase.table(table).select(columns).order(key).limit(page_size)
+        if last_key is not None:
+            query = query.gt(key, last_key)
+        
+        with timed(f'db-{table}'):
+            rows = query.execute().data or []
+        yield from rows
+        
+        if len(rows) < page_size:
+            return
+        last_key = rows[-1][key]
+
+def fetch_in_chunks(table, columns, column, values, chunk_size=IN_CHUNK_SIZE, timeout=STATS_QUERY_TIMEOUT_SECONDS):
+    """Fetch rows whose `column` is in `values`, splitting the list into concurrent chunks"""
+    values = list(values)
+    chunks = [values[start:start + chunk_size] for start in range(0, len(values), chunk_size)]
+    if not chunks:
+        return []
+    
+    def fetch_chunk(chunk):
+        return supabase.table(table).select(columns).in_(column, chunk).execute().data or []
+    
+    results, errors = run_queries_concurrently({
+        index: (lambda chunk=chunk: fetch_chunk(chunk))
+        for index, chunk in enumerate(chunks)
+    }, timeout=timeout, span=f'db-{table}')
+    if errors:
+        raise Exception(f"Failed to fetch {len(errors)} of {len(chunks)} {table} chunks: {next(iter(errors.values()))}")
+    
+    rows = []
+    for index in range(len(chunks)):
+        rows.extend(results[index])
+    return rows
+
+def count_signups(signups):
+    """Collect the distinct volunteers and the number of signups per event"""
+    user_ids = set()
+    event_signups = Counter()
+    for signup in signups:
+        user_ids.add(signup['user_id'])
+        event_signups[signup['event_id']] += 1
+    return user_ids, event_signups
+
+def sum_signup_hours(event_signups, events):
+    """Total hours over all signups, given events with their duration_hours"""
+    return sum(event_signups[event['id']] * event['duration_hours'] for event in events)
+
+def scan_signups(deadline=None):
+    """Stream all signups into a volunteer set and per-event counts"""
+    return count_signups(iter_table_rows('user_events', 'id, user_id, event_id', deadline=deadline))
+
+def scan_partner_organizations(deadline=None):
+    """Collect the distinct organizations that have events"""
+    return {
+        event['organization_id']
+        for event in iter_table_rows('events', 'id, organization_id', deadline=deadline)
+        if event['organization_id']
+    }
+
+def get_period_statistics(start, end, approximate=False):
+    """Statistics for signups made between two dates, summed from the daily rollup buckets.
+    
+    With approximate=True, active volunteers are estimated from the daily HyperLogLog
+    sketches instead of being counted exactly.
+    """
+    with timed('db-period'):
+        response = supabase.rpc('get_site_statistics_for_period', {
+            'p_start': start.isoformat(),
+            'p_end': end.isoformat(),
+            'p_approximate': approximate
+        }).execute()
+    row = (response.data or [{}])[0]
+    
+    return {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'approximate': approximate,
+        'signups': row.get('signups') or 0,
+        'active_volunteers': row.get('active_volunteers') or 0,
+        'hours_contributed': row.get('hours_contributed') or 0,
+        'partner_organizations': row.get('partner_organizations') or 0
+    }
+
+def estimate_active_volunteers(start, end, organization_id):
+    """Estimated distinct volunteers for one organization between two dates, merged from its daily sketches"""
+    with timed('db-estimate'):
+        response = supabase.rpc('estimate_active_volunteers', {
+            'p_start': start.isoformat(),
+            'p_end': end.isoformat(),
+            'p_organization_id': organization_id
+        }).execute()
+    
+    return {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'approximate': True,
+        'organization_id': organization_id,
+        'active_volunteers': response.data or 0
+    }
+
+def parse_breakdown(query_params):
+    """Validate ?breakdown=organization|event&sort=signups|hours|volunteers&limit=N"""
+    group_by = query_params.get('breakdown', [''])[0]
+    if group_by not in BREAKDOWN_GROUPS:
+        raise ValueError(f"Invalid breakdown. Must be one of: {BREAKDOWN_GROUPS}")
+    
+    sort = query_params.get('sort', ['signups'])[0]
+    if sort not in BREAKDOWN_SORTS:
+        raise ValueError(f"Invalid sort. Must be one of: {BREAKDOWN_SORTS}")
+    
+    try:
+        limit = int(query_params.get('limit', [DEFAULT_BREAKDOWN_LIMIT])[0])
+    except ValueError:
+        raise ValueError('limit must be an integer')
+    if not 1 <= limit <= MAX_BREAKDOWN_LIMIT:
+        raise ValueError(f'limit must be between 1 and {MAX_BREAKDOWN_LIMIT}')
+    
+    return group_by, sort, limit
+
+def get_statistics_breakdown(group_by, sort, limit):
+    """Top organizations or events by signups, hours or volunteers, from one grouped (and cached) RPC"""
+    with timed('db-breakdown'):
+        response = supabase.rpc('get_site_statistics_breakdown', {
+            'p_group_by': group_by,
+            'p_sort': sort,
+            'p_limit': limit
+        }).execute()
+    return response.data or []
+
+class handler(TimedRequestHandler):
     def do_OPTIONS(self):
         """Handle preflight CORS requests"""
         self.send_response(200)
@@ -30,89 +203,190 @@ class handler(BaseHTTPRequestHandler):
         self.end_headers()
         
     def do_GET(self):
-        """Get all site statistics with calculated and manual values"""
+        """Get all site statistics with calculated and manual values, plus a time window with ?period=.
+        
+        The window's active volunteers are estimated with ?approximate=true; with
+        ?organization_id= only that organization's estimated active volunteers are returned.
+        With ?breakdown=organization|event, per-organization or per-event statistics are returned instead.
+        """
         try:
-            # Calculate statistics directly from database tables
-            stats_data = self.calculate_statistics()
+            with timed('parse'):
+                query_params = parse_qs(urlparse(self.path).query)
             
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.end_headers()
+            if 'breakdown' in query_params:
+                self.send_breakdown(query_params)
+                return
+            
+            with timed('parse'):
+                period = None
+                if 'period' in query_params:
+                    try:
+                        period = parse_period(query_params)
+                    except ValueError as e:
+                        self.send_error_response(400, str(e))
+                        return
+                
+                approximate = query_params.get('approximate', ['false'])[0].lower() == 'true'
+                organization_id = query_params.get('organization_id', [None])[0]
+                if organization_id:
+                    try:
+                        organization_id = str(uuid.UUID(organization_id))
+                    except ValueError:
+                        self.send_error_response(400, 'organization_id must be a UUID')
+                        return
+                if organization_id and not period:
+                    self.send_error_response(400, 'organization_id requires a period')
+                    return
+            
+            # Serve the persisted values; recalculation happens on POST or the scheduled job
+            stats_data = self.get_persisted_statistics()
             
             result = {
                 'success': True,
                 'data': stats_data
             }
-            self.wfile.write(json.dumps(result).encode())
+            if organization_id:
+                result['period'] = {'period': query_params['period'][0], **estimate_active_volunteers(*period, organization_id)}
+            elif period:
+                result['period'] = {'period': query_params['period'][0], **get_period_statistics(*period, approximate)}
+            
+            with timed('serialize'):
+                body = json.dumps(result).encode()
+            
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            
+            self.wfile.write(body)
             
         except Exception as e:
             self.send_error_response(500, str(e))
     
+    def send_breakdown(self, query_params):
+        """Send per-organization or per-event statistics"""
+        try:
+            with timed('parse'):
+                group_by, sort, limit = parse_breakdown(query_params)
+        except ValueError as e:
+            self.send_error_response(400, str(e))
+            return
+        
+        rows = get_statistics_breakdown(group_by, sort, limit)
+        
+        result = {
+            'success': True,
+            'data': rows,
+            'breakdown': {
+                'group_by': group_by,
+                'sort': sort,
+                'limit': limit
+            }
+        }
+        
+        with timed('serialize'):
+            body = json.dumps(result).encode()
+        
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        
+        self.wfile.write(body)
+    
+    def recalculate_statistics(self, rebuild=False):
+        """Update the running counters in site_stats and return the resulting statistics.
+        
+        Normally only the signups and removals since the stored watermark are folded in;
+        rebuild=True recounts everything from user_events. Falls back to calculating
+        directly from the tables if the incremental functions are not available.
+        """
+        function_name = 'rebuild_site_statistics' if rebuild else 'fold_site_statistics'
+        try:
+            with timed(f'db-{function_name}'):
+                response = supabase.rpc(function_name).execute()
+        except Exception as e:
+            print(f"Error calling {function_name}, calculating from tables instead: {str(e)}")
+            return self.calculate_statistics()
+        
+        return self.format_site_statistics(response.data or [])
+    
+    def get_persisted_statistics(self):
+        """Read the stored calculated_value/manual_override/display_value rows in one query"""
+        with timed('db-site_stats'):
+            response = supabase.rpc('get_all_site_statistics').execute()
+        return self.format_site_statistics(response.data or [])
+    
+    def format_site_statistics(self, rows):
+        """Format get_all_site_statistics-shaped rows keyed by stat_type"""
+        stats_data = {}
+        for stat in rows:
+            stats_data[stat['stat_type']] = {
+                'calculated_value': stat['calculated_value'],
+                'manual_override': stat['manual_override'],
+                'display_value': stat['display_value'],
+                'last_calculated_at': stat['last_calculated_at']
+            }
+        return stats_data
+    
     def calculate_statistics(self):
         """Calculate statistics directly from database tables"""
-        print("DEBUG: calculate_statistics function called!")
         try:
+            # Signups and events are independent, so scan them concurrently; both scans and
+            # the event lookup share one budget, after which the scans stop paging
+            deadline = time.monotonic() + STATS_SCAN_TIMEOUT_SECONDS
+            results, errors = run_queries_concurrently({
+                'user_events': lambda: scan_signups(deadline),
+                'events': lambda: scan_partner_organizations(deadline)
+            }, timeout=STATS_SCAN_TIMEOUT_SECONDS, span='db-scan')
+            
+            signups = results.get('user_events')
+            unique_org_ids = results.get('events')
+            
             # Calculate active volunteers (unique users who signed up for events)
-            user_events_response = supabase.table('user_events').select('user_id').execute()
-            print(f"Debug: user_events_response.data = {user_events_response.data}")
-            print(f"Debug: user_events_response.error = {user_events_response.error}")
-            unique_user_ids = set()
-            if user_events_response.data:
-                unique_user_ids = set(event['user_id'] for event in user_events_response.data)
-            active_volunteers = len(unique_user_ids)
-            print(f"Debug: unique_user_ids = {unique_user_ids}")
-            print(f"Debug: active_volunteers = {active_volunteers}")
-            
-            # Calculate hours contributed
-            hours_contributed = 0
-            if user_events_response.data:
-                # Get event details for hours calculation
-                event_ids = list(set(event['event_id'] for event in user_events_response.data))
-                if event_ids:
-                    events_response = supabase.table('events').select('arrival_time, estimated_end_time').in_('id', event_ids).execute()
-                    if events_response.data:
-                        for event in events_response.data:
-                            if event['arrival_time'] and event['estimated_end_time']:
-                                # Calculate hours between arrival and estimated end time
-                                arrival = datetime.datetime.fromisoformat(event['arrival_time'].replace('Z', '+00:00'))
-                                end = datetime.datetime.fromisoformat(event['estimated_end_time'].replace('Z', '+00:00'))
-                                hours = max(1, int((end - arrival).total_seconds() / 3600))
-                                hours_contributed += hours
-                            else:
-                                # Default 2 hours if no time specified
-                                hours_contributed += 2
+            active_volunteers = None
+            if signups is not None:
+                unique_user_ids, event_signups = signups
+                active_volunteers = len(unique_user_ids)
+            
+            # Calculate hours contributed: every signup counts its event's duration
+            hours_contributed = None
+            if signups is not None:
+                try:
+                    remaining = max(0.0, deadline - time.monotonic())
+                    events = fetch_in_chunks('events', 'id, duration_hours', 'id', event_signups, timeout=remaining)
+                    with timed('compute'):
+                        hours_contributed = sum_signup_hours(event_signups, events)
+                except Exception as e:
+                    errors['events'] = str(e)
             
             # Calculate partner organizations (unique organizations with events)
-            events_response = supabase.table('events').select('organization_id').execute()
-            unique_org_ids = set()
-            if events_response.data:
-                unique_org_ids = set(event['organization_id'] for event in events_response.data if event['organization_id'])
-            partner_organizations = len(unique_org_ids)
-            
-            # Return formatted statistics
-            result = {
-                'active_volunteers': {
-                    'calculated_value': active_volunteers,
-                    'manual_override': None,
-                    'display_value': active_volunteers,
-                    'last_calculated_at': datetime.datetime.now().isoformat()
-                },
-                'hours_contributed': {
-                    'calculated_value': hours_contributed,
-                    'manual_override': None,
-                    'display_value': hours_contributed,
-                    'last_calculated_at': datetime.datetime.now().isoformat()
-                },
-                'partner_organizations': {
-                    'calculated_value': partner_organizations,
+            partner_organizations = None
+            if unique_org_ids is not None:
+                partner_organizations = len(unique_org_ids)
+            
+            for name, error in errors.items():
+                print(f"Error fetching {name} for statistics: {error}")
+            
+            # Statistics whose queries failed are reported as 0 with an error
+            values = {
+                'active_volunteers': active_volunteers,
+                'hours_contributed': hours_contributed,
+                'partner_organizations': partner_organizations
+            }
+            result = {}
+            for stat_type, value in values.items():
+                result[stat_type] = {
+                    'calculated_value': value or 0,
                     'manual_override': None,
-                    'display_value': partner_organizations,
+                    'display_value': value or 0,
                     'last_calculated_at': datetime.datetime.now().isoformat()
                 }
-            }
+                if value is None:
+                    result[stat_type]['error'] = 'Statistic could not be calculated: ' + '; '.join(errors.values())
             
-            print(f"Debug: Final result = {result}")
+            if STATS_DEBUG:
+                print(f"Debug: calculated statistics = {result}")
             return result
             
         except Exception as e:
@@ -140,22 +414,35 @@ class handler(BaseHTTPRequestHandler):
             }
     
     def do_POST(self):
-        """Recalculate all statistics"""
+        """Recalculate all statistics (incrementally, or fully with rebuild=true)"""
         try:
-            # Calculate statistics directly from database tables
-            stats_data = self.calculate_statistics()
+            with timed('parse'):
+                query_params = parse_qs(urlparse(self.path).query)
+                rebuild = query_params.get('rebuild', ['false'])[0].lower() == 'true'
+                
+                content_length = int(self.headers.get('Content-Length', 0))
+                if content_length:
+                    data = json.loads(self.rfile.read(content_length).decode() or '{}')
+                    rebuild = rebuild or data.get('rebuild') is True
+            
+            # A rebuild recounts every signup; otherwise only changes since the watermark
+            stats_data = self.recalculate_statistics(rebuild=rebuild)
+            
+            result = {
+                'success': True,
+                'message': 'Statistics rebuilt successfully' if rebuild else 'Statistics recalculated successfully',
+                'data': stats_data
+            }
+            
+            with timed('serialize'):
+                body = json.dumps(result).encode()
             
             self.send_response(200)
             self.send_header('Content-Type', 'application/json')
             self.send_header('Access-Control-Allow-Origin', '*')
             self.end_headers()
             
-            result = {
-                'success': True,
-                'message': 'Statistics recalculated successfully',
-                'data': stats_data
-            }
-            self.wfile.write(json.dumps(result).encode())
+            self.wfile.write(body)
             
         except Exception as e:
             self.send_error_response(500, str(e))
@@ -182,44 +469,33 @@ class handler(BaseHTTPRequestHandler):
                 return
             
             # Update the manual override
-            response = supabase.table('site_stats').update({
-                'manual_override': manual_override if manual_override is not None else None
-            }).eq('stat_type', stat_type).execute()
-            
-            if response.error:
-                raise Exception(f"Database error: {response.error}")
+            with timed('db-update'):
+                response = supabase.table('site_stats').update({
+                    'manual_override': manual_override if manual_override is not None else None
+                }).eq('stat_type', stat_type).execute()
             
             if not response.data:
                 self.send_error_response(404, 'Statistic not found')
                 return
             
             # Get updated statistics
-            stats_response = supabase.rpc('get_all_site_statistics').execute()
-            
-            if stats_response.error:
-                raise Exception(f"Database error: {stats_response.error}")
-            
-            # Format the data
-            stats_data = {}
-            for stat in stats_response.data:
-                stats_data[stat['stat_type']] = {
-                    'calculated_value': stat['calculated_value'],
-                    'manual_override': stat['manual_override'],
-                    'display_value': stat['display_value'],
-                    'last_calculated_at': stat['last_calculated_at']
-                }
-            
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.end_headers()
+            stats_data = self.get_persisted_statistics()
             
             result = {
                 'success': True,
                 'message': f'{stat_type} manual override updated successfully',
                 'data': stats_data
             }
-            self.wfile.write(json.dumps(result).encode())
+            
+            with timed('serialize'):
+                body = json.dumps(result).encode()
+            
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            
+            self.wfile.write(body)
             
         except Exception as e:
             self.send_error_response(500, str(e))
@@ -243,44 +519,33 @@ class handler(BaseHTTPRequestHandler):
                 return
             
             # Remove manual override (set to NULL)
-            response = supabase.table('site_stats').update({
-                'manual_override': None
-            }).eq('stat_type', stat_type).execute()
-            
-            if response.error:
-                raise Exception(f"Database error: {response.error}")
+            with timed('db-update'):
+                response = supabase.table('site_stats').update({
+                    'manual_override': None
+                }).eq('stat_type', stat_type).execute()
             
             if not response.data:
                 self.send_error_response(404, 'Statistic not found')
                 return
             
             # Get updated statistics
-            stats_response = supabase.rpc('get_all_site_statistics').execute()
-            
-            if stats_response.error:
-                raise Exception(f"Database error: {stats_response.error}")
-            
-            # Format the data
-            stats_data = {}
-            for stat in stats_response.data:
-                stats_data[stat['stat_type']] = {
-                    'calculated_value': stat['calculated_value'],
-                    'manual_override': stat['manual_override'],
-                    'display_value': stat['display_value'],
-                    'last_calculated_at': stat['last_calculated_at']
-                }
-            
-            self.send_response(200)
-            self.send_header('Content-Type', 'application/json')
-            self.send_header('Access-Control-Allow-Origin', '*')
-            self.end_headers()
+            stats_data = self.get_persisted_statistics()
             
             result = {
                 'success': True,
                 'message': f'{stat_type} manual override removed successfully',
                 'data': stats_data
             }
-            self.wfile.write(json.dumps(result).encode())
+            
+            with timed('serialize'):
+                body = json.dumps(result).encode()
+            
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            
+            self.wfile.write(body)
             
         except Exception as e:
             self.send_error_response(500, str(e))
@@ -296,4 +561,7 @@ class handler(BaseHTTPRequestHandler):
             'success': False,
             'error': error_message
         }
-        self.wfile.write(json.dumps(result).encode()) 
\ No newline at end of file
+        self.wfile.write(json.dumps(result).encode()) 
+
+# Module setup time, reported once as the 'init' span of this instance's first request
+record_cold_start(_module_started)
@@ -3,12 +3,22 @@ Statistics API endpoint for Vercel
 Handles fetching recorded and live statistics from Supabase
 """
 
+# Start of module setup, before the heavy imports, for the cold-start span
+import time
+_module_started = time.perf_counter()
+
 import os
+import sys
 import json
-from http.server import BaseHTTPRequestHandler
-from datetime import datetime
+import threading
+from urllib.parse import urlparse, parse_qs
 from supabase import create_client, Client
 
+# Shared helpers (api/_*.py) live next to this handler
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from _timing import TimedRequestHandler, record_cold_start, timed
+from _statistics import parse_period, run_queries_concurrently
+
 # Initialize Supabase client
 supabase_url = os.environ.get('VITE_SUPABASE_URL', 'https://gzzbjifmrwvqbkwbyvhm.supabase.co')
 supabase_key = os.environ.get('SUPABASE_SERVICE_ROLE_KEY', os.environ.get('VITE_SUPABASE_SERVICE_ROLE_KEY', ''))
@@ -19,86 +29,193 @@ if not supabase_key:
 
 supabase: Client = create_client(supabase_url, supabase_key)
 
-def get_statistics():
-    """Fetch both confirmed and estimate statistics from site_stats table"""
+# Cached site_stats rows are fresh for this long
+STATISTICS_TTL_SECONDS = float(os.environ.get('STATISTICS_TTL_SECONDS', '60'))
+
+# After the TTL, stale rows are still served instantly for this long while one refresher runs
+STATISTICS_STALE_SECONDS = float(os.environ.get('STATISTICS_STALE_SECONDS', '600'))
+
+# After a failed refresh, wait this long before trying Supabase again
+STATISTICS_RETRY_SECONDS = float(os.environ.get('STATISTICS_RETRY_SECONDS', '10'))
+
+# Statistics kept in site_stats, one row each
+STAT_TYPES = ['active_volunteers', 'hours_contributed', 'partner_organizations']
+
+# Last-known-good site_stats rows keyed by stat_type
+_statistics_cache = {
+    'rows': None,
+    'fetched_at': 0.0,
+    'retry_at': 0.0,
+    'refreshing': False
+}
+_statistics_lock = threading.Lock()
+
+def format_statistics(rows):
+    """Build the confirmed/estimates structure from site_stats rows keyed by stat_type.
+    
+    A statistic without a row is null rather than a made-up number.
+    """
+    confirmed = {}
+    estimates = {}
+    
+    for stat_type in STAT_TYPES:
+        stat = rows.get(stat_type) or {}
+        confirmed[stat_type] = stat.get('confirmed_total')
+        estimates[stat_type] = stat.get('current_estimate')
+    
+    return {
+        'confirmed': confirmed,
+        'estimates': estimates
+    }
+
+def refresh_statistics():
+    """Re-read site_stats into the cache, keeping the last-known-good rows on failure"""
     try:
-        # Get all stats from site_stats table
-        response = supabase.table('site_stats').select('*').execute()
+        with timed('db-site_stats'):
+            response = supabase.table('site_stats').select('*').execute()
+        rows = {stat['stat_type']: stat for stat in response.data or []}
         
-        # Create dictionaries for both values
-        confirmed = {}
-        estimates = {}
-        
-        if response.data:
-            for stat in response.data:
-                stat_type = stat['stat_type']
-                confirmed[stat_type] = stat['confirmed_total']
-                estimates[stat_type] = stat['current_estimate']
-        
-        # Return with defaults if not found
-        return {
-            'confirmed': {
-                'active_volunteers': confirmed.get('active_volunteers', 2500),
-                'hours_contributed': confirmed.get('hours_contributed', 5000),
-                'partner_organizations': confirmed.get('partner_organizations', 50)
-            },
-            'estimates': {
-                'active_volunteers': estimates.get('active_volunteers', 2500),
-                'hours_contributed': estimates.get('hours_contributed', 5000),
-                'partner_organizations': estimates.get('partner_organizations', 50)
-            }
-        }
+        with _statistics_lock:
+            _statistics_cache['rows'] = rows
+            _statistics_cache['fetched_at'] = time.monotonic()
     except Exception as e:
         print(f"Error fetching statistics: {str(e)}")
-        # Return default values on error
-        return {
-            'confirmed': {
-                'active_volunteers': 2500,
-                'hours_contributed': 5000,
-                'partner_organizations': 50
-            },
-            'estimates': {
-                'active_volunteers': 2500,
-                'hours_contributed': 5000,
-                'partner_organizations': 50
-            }
-        }
+        with _statistics_lock:
+            _statistics_cache['retry_at'] = time.monotonic() + STATISTICS_RETRY_SECONDS
+    finally:
+        with _statistics_lock:
+            _statistics_cache['refreshing'] = False
 
-def calculate_live_statistics():
-    """Calculate live statistics based on current data"""
-    try:
-        live_stats = {}
-        
-        # Calculate active volunteers (ONLY actual users, not organizations)
-        profiles_response = supabase.table('profiles').select('*', count='exact').neq('user_type', 'organization').execute()
-        
-        if profiles_response.data:
-            # Count only actual users, excluding organizations
-            live_stats['active_volunteers'] = len(profiles_response.data)
-        else:
-            live_stats['active_volunteers'] = 0
+def get_statistics():
+    """Fetch both confirmed and estimate statistics, served stale-while-revalidate.
+    
+    Returns None while there is no last-known-good: site_stats has never been read
+    successfully, or this request arrived while the first read was still running.
+    """
+    now = time.monotonic()
+    
+    with _statistics_lock:
+        cache = _statistics_cache
+        age = now - cache['fetched_at']
+        can_refresh = not cache['refreshing'] and now >= cache['retry_at']
         
-        # Calculate hours contributed (count of signups * 2 hours default)
-        if user_events_response.count is not None:
-            live_stats['hours_contributed'] = user_events_response.count * 2
+        if cache['rows'] is None or age >= STATISTICS_TTL_SECONDS + STATISTICS_STALE_SECONDS:
+            # Nothing usable cached: this request refreshes synchronously
+            mode = 'sync' if can_refresh else 'cached'
+        elif age >= STATISTICS_TTL_SECONDS and can_refresh:
+            # Stale but usable: answer now, refresh in the background
+            mode = 'background'
         else:
-            live_stats['hours_contributed'] = 0
-        
-        # Calculate partner organizations
-        orgs_response = supabase.table('organizations').select('*', count='exact').execute()
-        live_stats['partner_organizations'] = orgs_response.count if orgs_response.count else 0
+            mode = 'cached'
         
-        return live_stats
+        if mode != 'cached':
+            cache['refreshing'] = True
+    
+    if mode == 'sync':
+        refresh_statistics()
+    elif mode == 'background':
+        threading.Thread(target=refresh_statistics, daemon=True).start()
+    
+    with _statistics_lock:
+        rows = _statistics_cache['rows']
+    return None if rows is None else format_statistics(rows)
+
+def store_statistics(rows):
+    """Replace the cache with site_stats rows returned by a write"""
+    with _statistics_lock:
+        _statistics_cache['rows'] = rows
+        _statistics_cache['fetched_at'] = time.monotonic()
+
+def parse_statistic_update(update):
+    """Validate one {stat_type, field_type, value} update and return (stat_type, column, value)"""
+    if not isinstance(update, dict):
+        raise ValueError('Each update must be an object with stat_type, field_type, value')
+    
+    stat_type = update.get('stat_type')
+    field_type = update.get('field_type')  # 'confirmed' or 'estimate'
+    value = update.get('value')
+    
+    if not stat_type or not field_type or value is None:
+        raise ValueError('Missing required fields: stat_type, field_type, value')
+    
+    # Validate value is non-negative integer; lists and objects are rejected too
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise ValueError('Value must be a valid integer')
+    if value < 0:
+        raise ValueError('Value must be a non-negative integer')
+    
+    # Validate stat_type
+    if stat_type not in STAT_TYPES:
+        raise ValueError(f'Invalid stat_type. Must be one of: {STAT_TYPES}')
+    
+    update_field = 'confirmed_total' if field_type == 'confirmed' else 'current_estimate'
+    return stat_type, update_field, value
+
+def count_rows(query):
+    """Run a count='exact' query limited to 0 rows, so only the count is transferred"""
+    return query.execute().count or 0
+
+def get_persisted_hours():
+    """Hours from the site_stats counter, which sums events.duration_hours per signup like get_live_statistics"""
+    response = supabase.table('site_stats').select('calculated_value').eq('stat_type', 'hours_contributed').limit(1).execute()
+    return (response.data or [{}])[0].get('calculated_value') or 0
+
+def calculate_live_statistics():
+    """Calculate live statistics based on current data"""
+    try:
+        # One aggregate RPC returns all three counters in a single round-trip
+        with timed('db-live_statistics'):
+            response = supabase.rpc('get_live_statistics').execute()
+        if response.data:
+            row = response.data[0]
+            return {
+                'active_volunteers': row['active_volunteers'] or 0,
+                'hours_contributed': row['hours_contributed'] or 0,
+                'partner_organizations': row['partner_organizations'] or 0
+            }
     except Exception as e:
-        print(f"Error calculating live statistics: {str(e)}")
-        # Return zeros on error
-        return {
-            'active_volunteers': 0,
-            'hours_contributed': 0,
-            'partner_organizations': 0
-        }
+        print(f"Error calling get_live_statistics, falling back to count queries: {str(e)}")
+    
+    # Count-only queries run concurrently; cost does not depend on the number of rows
+    results, errors = run_queries_concurrently({
+        'active_volunteers': lambda: count_rows(
+            supabase.table('profiles').select('id', count='exact').neq('user_type', 'organization').limit(0)
+        ),
+        'hours_contributed': get_persisted_hours,
+        'partner_organizations': lambda: count_rows(supabase.table('organizations').select('id', count='exact').limit(0))
+    }, span='db-counts')
+    
+    for name, error in errors.items():
+        print(f"Error calculating live statistic {name}: {error}")
+    
+    # Counters whose query failed are null rather than a made-up 0; the others are still reported
+    return {
+        'active_volunteers': results.get('active_volunteers'),
+        'hours_contributed': results.get('hours_contributed'),
+        'partner_organizations': results.get('partner_organizations')
+    }
+
+def get_period_statistics(start, end):
+    """Statistics for signups made between two dates, summed from the daily rollup buckets"""
+    with timed('db-period'):
+        response = supabase.rpc('get_site_statistics_for_period', {
+            'p_start': start.isoformat(),
+            'p_end': end.isoformat()
+        }).execute()
+    row = (response.data or [{}])[0]
+    
+    return {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'signups': row.get('signups') or 0,
+        'active_volunteers': row.get('active_volunteers') or 0,
+        'hours_contributed': row.get('hours_contributed') or 0,
+        'partner_organizations': row.get('partner_organizations') or 0
+    }
 
-class handler(BaseHTTPRequestHandler):
+class handler(TimedRequestHandler):
     def do_OPTIONS(self):
         """Handle preflight CORS requests"""
         self.send_response(200)
@@ -108,10 +225,24 @@ class handler(BaseHTTPRequestHandler):
         self.end_headers()
         
     def do_GET(self):
-        """Get statistics"""
+        """Get statistics, plus counters calculated from live data when ?calculated=true"""
         try:
+            with timed('parse'):
+                query_params = parse_qs(urlparse(self.path).query)
+                
+                period = None
+                if 'period' in query_params:
+                    try:
+                        period = parse_period(query_params)
+                    except ValueError as e:
+                        self.send_error_response(400, str(e))
+                        return
+            
             # Get statistics from database
             stats = get_statistics()
+            if stats is None:
+                self.send_error_response(503, 'Statistics are unavailable: site_stats could not be read')
+                return
             
             # Format the response
             result = {
@@ -122,63 +253,67 @@ class handler(BaseHTTPRequestHandler):
                 }
             }
             
+            if query_params.get('calculated', ['false'])[0].lower() == 'true':
+                result['data']['calculated'] = calculate_live_statistics()
+            
+            if period:
+                result['data']['period'] = {'period': query_params['period'][0], **get_period_statistics(*period)}
+            
+            with timed('serialize'):
+                body = json.dumps(result).encode()
+            
             self.send_response(200)
             self.send_header('Content-Type', 'application/json')
             self.send_header('Access-Control-Allow-Origin', '*')
             self.end_headers()
             
-            self.wfile.write(json.dumps(result).encode())
+            self.wfile.write(body)
             
         except Exception as e:
             self.send_error_response(500, str(e))
     
     def do_POST(self):
-        """Update statistics - supports updating both confirmed and estimate values"""
+        """Update statistics - supports updating both confirmed and estimate values.
+        
+        Accepts a single {stat_type, field_type, value} or {"updates": [...]} with several,
+        which are written in one statement.
+        """
         try:
-            content_length = int(self.headers.get('Content-Length', 0))
-            body = self.rfile.read(content_length)
-            data = json.loads(body.decode())
+            with timed('parse'):
+                content_length = int(self.headers.get('Content-Length', 0))
+                body = self.rfile.read(content_length)
+                data = json.loads(body.decode())
             
-            # Validate input
-            stat_type = data.get('stat_type')
-            field_type = data.get('field_type')  # 'confirmed' or 'estimate'
-            value = data.get('value')
-            
-            if not stat_type or not field_type or value is None:
-                self.send_error_response(400, 'Missing required fields: stat_type, field_type, value')
+            updates = data['updates'] if isinstance(data, dict) and 'updates' in data else [data]
+            if not isinstance(updates, list) or not updates:
+                self.send_error_response(400, 'updates must be a non-empty list')
                 return
             
-            # Validate value is non-negative integer
-            try:
-                value = int(value)
-                if value < 0:
-                    self.send_error_response(400, 'Value must be a non-negative integer')
+            # Validate every update before writing any; later updates to the same field win
+            records = {}
+            for update in updates:
+                try:
+                    stat_type, update_field, value = parse_statistic_update(update)
+                except ValueError as e:
+                    self.send_error_response(400, str(e))
                     return
-            except ValueError:
-                self.send_error_response(400, 'Value must be a valid integer')
-                return
-            
-            # Validate stat_type
-            valid_stat_types = ['active_volunteers', 'hours_contributed', 'partner_organizations']
-            if stat_type not in valid_stat_types:
-                self.send_error_response(400, f'Invalid stat_type. Must be one of: {valid_stat_types}')
-                return
-            
-            # Update the appropriate field
-            update_field = 'confirmed_total' if field_type == 'confirmed' else 'current_estimate'
-            
-            # Update the statistic
-            response = supabase.table('site_stats').update({
-                update_field: value,
-                'updated_at': datetime.now().isoformat()
-            }).eq('stat_type', stat_type).execute()
+                records.setdefault(stat_type, {'stat_type': stat_type})[update_field] = value
             
-            if not response.data:
-                self.send_error_response(404, f'Statistic not found: {stat_type}')
-                return
+            # One UPDATE for all stats; it returns every site_stats row as written, or writes
+            # nothing and raises no_data_found (P0002) if any stat_type has no row
+            try:
+                with timed('db-update'):
+                    response = supabase.rpc('update_site_stats', {'p_updates': list(records.values())}).execute()
+            except Exception as e:
+                if getattr(e, 'code', None) == 'P0002':
+                    self.send_error_response(404, getattr(e, 'message', None) or str(e))
+                    return
+                raise
+            rows = {stat['stat_type']: stat for stat in response.data or []}
             
-            # Return updated statistics
-            stats = get_statistics()
+            # Keep the cache in step with the write and answer from the returned rows
+            store_statistics(rows)
+            stats = format_statistics(rows)
             
             result = {
                 'success': True,
@@ -188,12 +323,15 @@ class handler(BaseHTTPRequestHandler):
                 }
             }
             
+            with timed('serialize'):
+                body = json.dumps(result).encode()
+            
             self.send_response(200)
             self.send_header('Content-Type', 'application/json')
             self.send_header('Access-Control-Allow-Origin', '*')
             self.end_headers()
             
-            self.wfile.write(json.dumps(result).encode())
+            self.wfile.write(body)
             
         except Exception as e:
             self.send_error_response(500, str(e))
@@ -217,4 +355,7 @@ class handler(BaseHTTPRequestHandler):
             'success': False,
             'error': error_message
         }
-        self.wfile.write(json.dumps(result).encode())
\ No newline at end of file
+        self.wfile.write(json.dumps(result).encode())
+
+# Module setup time, reported once as the 'init' span of this instance's first request
+record_cold_start(_module_started)
@@ -12,6 +12,10 @@ from typing import Dict, Optional
 from datetime import datetime
 from dotenv import load_dotenv
 
+# The shared email rate limiter lives with the other email scripts
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'email-service'))
+from rate_limited_sender import email_sender
+
 # Load environment variables
 load_dotenv()
 
@@ -53,13 +57,7 @@ class ContactFormHandler:
             }
             
             # Send the email via Resend API
-            response = requests.post(
-                "https://api.resend.com/emails",
-                headers=self.headers,
-                json=email_data
-            )
-            
-            response.raise_for_status()
+            response = email_sender.send(self._post_email, email_data)
             result = response.json()
             
             print(f"✅ Contact form email sent successfully!")
@@ -77,6 +75,17 @@ class ContactFormHandler:
             print(f"❌ Error sending contact email: {e}")
             return False
     
+    def _post_email(self, email_data: Dict) -> requests.Response:
+        """POST one email to the Resend API, raising on an error status"""
+        response = requests.post(
+            "https://api.resend.com/emails",
+            headers=self.headers,
+            json=email_data
+        )
+        
+        response.raise_for_status()
+        return response
+    
     def _create_email_html(self, name: str, email: str, message: str) -> str:
         """Create a nicely formatted HTML email with the site's theme"""
         
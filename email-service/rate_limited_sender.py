@@ -0,0 +1,153 @@
+"""
+Rate-limited, concurrent email sending shared by the email scripts
+Every Resend request in a process goes through one token bucket set to our Resend quota.
+When Resend answers 429 the bucket pauses for Retry-After and halves its rate, then
+recovers towards the quota as requests succeed. A spent daily or monthly quota, or a
+Retry-After longer than MAX_RATE_LIMIT_PAUSE_SECONDS, is raised at once instead of
+stalling every sender.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Callable, Iterable, Iterator, Optional
+
+# Resend requests per second allowed by our plan
+RESEND_REQUESTS_PER_SECOND = float(os.getenv('RESEND_REQUESTS_PER_SECOND', '2'))
+
+# Sends in flight at once
+EMAIL_SEND_CONCURRENCY = int(os.getenv('EMAIL_SEND_CONCURRENCY', '4'))
+
+# Retries of a request rejected with 429 before the error is raised to the caller
+EMAIL_RATE_LIMIT_RETRIES = int(os.getenv('EMAIL_RATE_LIMIT_RETRIES', '5'))
+
+# Longest a 429 may pause the shared bucket; a longer Retry-After is raised instead
+MAX_RATE_LIMIT_PAUSE_SECONDS = float(os.getenv('MAX_RATE_LIMIT_PAUSE_SECONDS', '60'))
+
+# Resend 429s that retrying cannot fix until the quota resets
+QUOTA_ERROR_TYPES = ('daily_quota_exceeded', 'monthly_quota_exceeded')
+
+# Backing off never drops the rate below this fraction of the quota
+MIN_RATE_FRACTION = 0.1
+
+# Fraction of the quota regained after each successful request
+RATE_RECOVERY_STEP = 0.1
+
+class TokenBucket:
+    """Thread-safe token bucket whose rate adapts to 429 responses"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.max_rate = rate
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def refill(self, now: float):
+        """Add the tokens earned since the last update; none are earned while paused"""
+        earning_since = max(self.updated, self.paused_until)
+        if now > earning_since:
+            self.tokens = min(self.capacity, self.tokens + (now - earning_since) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """Block until a request may be made"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.refill(now)
+                if now >= self.paused_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = max(self.paused_until - now, (1 - self.tokens) / self.rate)
+            time.sleep(wait)
+
+    def slow_down(self, delay: float):
+        """Pause every caller for `delay` seconds (at most MAX_RATE_LIMIT_PAUSE_SECONDS) and halve the rate, once per rate-limit episode"""
+        delay = min(delay, MAX_RATE_LIMIT_PAUSE_SECONDS)
+        with self.lock:
+            now = time.monotonic()
+            self.refill(now)
+            # Concurrent requests rejected by the same episode only extend the pause
+            if now >= self.paused_until:
+                self.rate = max(self.max_rate * MIN_RATE_FRACTION, self.rate / 2)
+            self.paused_until = max(self.paused_until, now + delay)
+            self.tokens = 0.0
+
+    def speed_up(self):
+        """Move the rate back towards the quota after a successful request"""
+        with self.lock:
+            if self.rate < self.max_rate:
+                self.refill(time.monotonic())
+                self.rate = min(self.max_rate, self.rate + self.max_rate * RATE_RECOVERY_STEP)
+
+def is_rate_limited(error: Exception) -> bool:
+    """Whether an error is a 429, from the resend SDK (`code`) or requests (`response.status_code`)"""
+    response = getattr(error, 'response', None)
+    status = getattr(response, 'status_code', None) or getattr(error, 'code', None)
+    return str(status) == '429'
+
+def is_quota_exceeded(error: Exception) -> bool:
+    """Whether a 429 is for a spent daily or monthly quota, from the resend SDK (`error_type`) or a requests response body (`name`)"""
+    error_type = getattr(error, 'error_type', None)
+    if error_type is None:
+        try:
+            error_type = error.response.json().get('name')
+        except Exception:
+            return False
+    return error_type in QUOTA_ERROR_TYPES
+
+def get_retry_after(error: Exception) -> Optional[float]:
+    """Seconds to wait from an error's Retry-After header, if it has one"""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or getattr(error, 'headers', None) or {}
+    value = next((value for name, value in headers.items() if name.lower() == 'retry-after'), None)
+    if value is None:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+class RateLimitedSender:
+    """Makes email API requests under a shared token bucket, retrying short-lived 429s, on a bounded pool of threads"""
+
+    def __init__(self, limiter: Optional[TokenBucket] = None, max_workers: int = EMAIL_SEND_CONCURRENCY, max_retries: int = EMAIL_RATE_LIMIT_RETRIES):
+        self.limiter = limiter or TokenBucket(RESEND_REQUESTS_PER_SECOND)
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+
+    def send(self, request: Callable, *args, **kwargs):
+        """Make one request (e.g. resend.Emails.send) once the limiter allows it, retrying if it is rate limited"""
+        for attempt in range(self.max_retries + 1):
+            self.limiter.acquire()
+            try:
+                result = request(*args, **kwargs)
+            except Exception as e:
+                if not is_rate_limited(e) or is_quota_exceeded(e) or attempt == self.max_retries:
+                    raise
+                retry_after = get_retry_after(e)
+                if retry_after is not None and retry_after > MAX_RATE_LIMIT_PAUSE_SECONDS:
+                    raise
+                self.limiter.slow_down(retry_after if retry_after is not None else 2 ** attempt)
+                continue
+            self.limiter.speed_up()
+            return result
+
+    def map(self, fn: Callable, items: Iterable) -> Iterator:
+        """Run fn over items on up to max_workers threads, yielding results in order (fn should request through send())"""
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            yield from executor.map(fn, items)
+
+# Shared by every email sent from this process
+email_sender = RateLimitedSender()
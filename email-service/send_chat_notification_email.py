@@ -2,11 +2,15 @@ import resend
 import os
 import sys
 import psycopg2
+import psycopg2.extensions
 import logging
+import queue
+import threading
 from datetime import datetime, timedelta, timezone
-from typing import List, Dict, Optional
-from resend import Resend
+from collections import defaultdict
+from typing import List, Dict, Optional, Tuple
 import time
+from rate_limited_sender import email_sender
 
 # Configure logging
 logging.basicConfig(
@@ -21,13 +25,15 @@ logger = logging.getLogger(__name__)
 
 # Initialize Resend with latest API
 try:
-    resend_api_key = os.getenv('RESEND_API_KEY', "re_e32x6j2U_Mx5KLTyeAW5oBVYPftpDnH92")
-    resend_client = Resend(api_key=resend_api_key)
+    resend.api_key = os.getenv('RESEND_API_KEY', "re_e32x6j2U_Mx5KLTyeAW5oBVYPftpDnH92")
     logger.info("Resend client initialized successfully")
 except Exception as e:
     logger.error(f"Failed to initialize Resend client: {e}")
     sys.exit(1)
 
+# Most emails Resend accepts in one batch request
+RESEND_BATCH_SIZE = 100
+
 # Database connection
 DB_HOST = os.getenv('DB_HOST', 'aws-0-us-east-2.pooler.supabase.com')
 DB_PORT = os.getenv('DB_PORT', '6543')
@@ -57,9 +63,95 @@ def get_db_connection():
                 return None
             time.sleep(2 ** attempt)  # Exponential backoff
 
+# Most connections a run holds open at once
+DB_POOL_MAX_CONNECTIONS = int(os.getenv('DB_POOL_MAX_CONNECTIONS', '4'))
+
+# Pooled connections idle for longer than this many seconds are pinged before reuse
+DB_HEALTH_CHECK_INTERVAL = float(os.getenv('DB_HEALTH_CHECK_INTERVAL', '30'))
+
+class ConnectionPool:
+    """Database connections reused across a processing run, reconnecting when one goes bad"""
+    
+    def __init__(self, max_connections: int):
+        self.idle = queue.LifoQueue()
+        self.slots = threading.BoundedSemaphore(max_connections)
+    
+    def getconn(self):
+        """Borrow a healthy connection, opening a new one if none is idle (None if that fails)"""
+        self.slots.acquire()
+        while True:
+            try:
+                connection, idle_since = self.idle.get_nowait()
+            except queue.Empty:
+                connection = get_db_connection()
+                if not connection:
+                    self.slots.release()
+                return connection
+            
+            if self.is_healthy(connection, idle_since):
+                return connection
+            logger.info("Discarding unhealthy pooled database connection")
+            self.close_quietly(connection)
+    
+    def putconn(self, connection):
+        """Return a borrowed connection, ending any open transaction or dropping it if broken"""
+        if not connection:
+            return
+        
+        try:
+            status = connection.get_transaction_status()
+            if status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+                self.close_quietly(connection)
+            else:
+                # Idle connections must not hold a transaction (and a server connection) open on the pooler
+                if status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    connection.rollback()
+                self.idle.put((connection, time.monotonic()))
+        except Exception as e:
+            logger.warning(f"Discarding database connection that could not be returned to the pool: {e}")
+            self.close_quietly(connection)
+        finally:
+            self.slots.release()
+    
+    def is_healthy(self, connection, idle_since: float) -> bool:
+        """Check a pooled connection is still open, pinging it if it has been idle a while"""
+        if connection.closed:
+            return False
+        if time.monotonic() - idle_since < DB_HEALTH_CHECK_INTERVAL:
+            return True
+        
+        try:
+            cursor = connection.cursor()
+            cursor.execute("SELECT 1")
+            cursor.close()
+            connection.rollback()
+            return True
+        except Exception as e:
+            logger.warning(f"Pooled database connection failed health check: {e}")
+            return False
+    
+    def close_quietly(self, connection):
+        """Close a connection, ignoring errors from one that is already broken"""
+        try:
+            connection.close()
+        except Exception:
+            pass
+    
+    def closeall(self):
+        """Close every idle connection at the end of a run"""
+        while True:
+            try:
+                connection, _ = self.idle.get_nowait()
+            except queue.Empty:
+                return
+            self.close_quietly(connection)
+
+# Shared by every database call in this process
+db_pool = ConnectionPool(DB_POOL_MAX_CONNECTIONS)
+
 def get_pending_notifications():
     """Get pending notifications that need to be sent using the new function"""
-    connection = get_db_connection()
+    connection = db_pool.getconn()
     if not connection:
         return []
     
@@ -84,164 +176,217 @@ def get_pending_notifications():
         logger.error(f"Database error getting pending notifications: {e}")
         return []
     finally:
-        connection.close()
+        db_pool.putconn(connection)
 
-def should_send_notification(user_id: str, event_id: str, message_id: str) -> bool:
-    """Check if we should send a notification based on user preferences and recent activity"""
-    connection = get_db_connection()
+def get_notification_eligibility(notifications: List[Dict]) -> Optional[Tuple[Dict[str, bool], Dict[str, str]]]:
+    """Decide for a whole batch which notifications to send, based on user preferences and recent activity.
+    
+    Returns (eligibility, covered_by). A notification that repeats one sent earlier in the same
+    batch is not eligible; covered_by maps it to that earlier notification's id, so it is only
+    skipped once that email has actually been sent.
+    """
+    connection = db_pool.getconn()
     if not connection:
-        return False
+        return None
     
     try:
         cursor = connection.cursor()
         
-        # Get user preferences
-        cursor.execute("""
-            SELECT email_frequency, chat_notifications
-            FROM notification_preferences
-            WHERE user_id = %s
-        """, (user_id,))
-        
-        result = cursor.fetchone()
-        if result:
-            email_frequency, chat_notifications = result
-        else:
-            # Default preferences
-            email_frequency, chat_notifications = 'immediate', True
-        
-        # If chat notifications are disabled, don't send
-        if not chat_notifications:
-            logger.info(f"Chat notifications disabled for user {user_id}")
-            return False
-        
-        # Check if we've already sent a notification for this message to this user
+        # One query for the batch: each notification's preferences and whether it (or its event) was already emailed
         cursor.execute("""
-            SELECT COUNT(*) FROM notifications 
-            WHERE user_id = %s AND chat_message_id = %s AND email_sent = true
-        """, (user_id, message_id))
+            SELECT
+                b.id,
+                COALESCE(np.email_frequency, 'immediate'),
+                COALESCE(np.chat_notifications, true),
+                EXISTS (
+                    SELECT 1 FROM notifications n
+                    WHERE n.user_id = b.user_id AND n.chat_message_id = b.chat_message_id AND n.email_sent = true
+                ),
+                EXISTS (
+                    SELECT 1 FROM notifications n
+                    WHERE n.user_id = b.user_id AND n.event_id = b.event_id AND n.email_sent = true
+                    AND n.sent_at > %s
+                )
+            FROM unnest(%s::uuid[], %s::uuid[], %s::uuid[], %s::uuid[]) AS b(id, user_id, event_id, chat_message_id)
+            LEFT JOIN notification_preferences np ON np.user_id = b.user_id
+        """, (
+            datetime.now(timezone.utc) - timedelta(hours=24),
+            [str(notification['id']) for notification in notifications],
+            [str(notification['user_id']) for notification in notifications],
+            [str(notification['event_id']) for notification in notifications],
+            [str(notification['chat_message_id']) for notification in notifications]
+        ))
+        rows = {str(row[0]): row[1:] for row in cursor.fetchall()}
         
-        if cursor.fetchone()[0] > 0:
-            logger.info(f"Notification already sent for message {message_id} to user {user_id}")
-            return False
-        
-        # For immediate notifications, always send
-        if email_frequency == 'immediate':
-            return True
-        
-        # For daily/weekly, check if we've sent one recently
-        if email_frequency in ['daily', 'weekly']:
-            # Check if we've sent a notification for this event in the last 24 hours
-            cursor.execute("""
-                SELECT COUNT(*) FROM notifications 
-                WHERE user_id = %s AND event_id = %s AND email_sent = true 
-                AND sent_at > %s
-            """, (user_id, event_id, datetime.now(timezone.utc) - timedelta(hours=24)))
+        eligibility = {}
+        covered_by = {}
+        # Messages and events emailed earlier in this batch, mapped to the notification sending them
+        batch_messages = {}
+        batch_events = {}
+        for notification in notifications:
+            notification_id = str(notification['id'])
+            user_id = str(notification['user_id'])
+            message_key = (user_id, str(notification['chat_message_id']))
+            event_key = (user_id, str(notification['event_id']))
+            email_frequency, chat_notifications, sent_for_message, sent_for_event = rows[notification_id]
             
-            if cursor.fetchone()[0] > 0:
-                logger.info(f"Recent notification already sent for event {event_id} to user {user_id}")
-                return False
+            # If chat notifications are disabled, don't send
+            if not chat_notifications:
+                logger.info(f"Chat notifications disabled for user {user_id}")
+                eligibility[notification_id] = False
+            elif sent_for_message:
+                logger.info(f"Notification already sent for message {message_key[1]} to user {user_id}")
+                eligibility[notification_id] = False
+            # For daily/weekly, only send if we haven't sent one for this event in the last 24 hours
+            elif email_frequency in ['daily', 'weekly'] and sent_for_event:
+                logger.info(f"Recent notification already sent for event {event_key[1]} to user {user_id}")
+                eligibility[notification_id] = False
+            # Repeats of an email sent earlier in this batch wait on that email
+            elif message_key in batch_messages or (email_frequency in ['daily', 'weekly'] and event_key in batch_events):
+                eligibility[notification_id] = False
+                covered_by[notification_id] = batch_messages.get(message_key) or batch_events[event_key]
+            else:
+                eligibility[notification_id] = True
+                batch_messages[message_key] = notification_id
+                batch_events.setdefault(event_key, notification_id)
         
-        return True
+        return eligibility, covered_by
         
     except Exception as e:
-        logger.error(f"Database error checking notification: {e}")
-        return False
+        logger.error(f"Database error checking notification eligibility: {e}")
+        return None
     finally:
-        connection.close()
+        db_pool.putconn(connection)
 
-def send_chat_notification_email(notification: Dict) -> bool:
-    """Send chat notification email using latest Resend API"""
-    try:
-        # Determine sender information
-        sender_name = notification.get('sender_name', 'Anonymous')
-        sender_type = notification.get('sender_type', 'anonymous')
-        event_title = notification.get('event_title', 'Event')
-        event_description = notification.get('event_description', '')
-        organization_name = notification.get('organization_name', 'Community Event')
-        
-        # Create email content with improved design
-        subject = f"New message in \"{event_title}\" chat"
+def render_chat_notification_email(notification: Dict) -> Dict:
+    """Build the Resend send parameters for a chat notification email"""
+    # Determine sender information
+    sender_name = notification.get('sender_name', 'Anonymous')
+    sender_type = notification.get('sender_type', 'anonymous')
+    event_title = notification.get('event_title', 'Event')
+    event_description = notification.get('event_description', '')
+    organization_name = notification.get('organization_name', 'Community Event')
+    
+    # Create email content with improved design
+    subject = f"New message in \"{event_title}\" chat"
+    
+    html_content = f"""
+    <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px;">
+        <div style="text-align: center; margin-bottom: 30px;">
+            <h1 style="color: #1B365F; margin: 0; font-size: 28px; font-weight: 600;">Main Street Connect</h1>
+            <p style="color: #666; margin: 10px 0 0 0; font-size: 16px;">New Chat Message</p>
+        </div>
         
-        html_content = f"""
-        <div style="font-family: Arial, sans-serif; max-width: 600px; margin: 0 auto; padding: 20px;">
-            <div style="text-align: center; margin-bottom: 30px;">
-                <h1 style="color: #1B365F; margin: 0; font-size: 28px; font-weight: 600;">Main Street Connect</h1>
-                <p style="color: #666; margin: 10px 0 0 0; font-size: 16px;">New Chat Message</p>
-            </div>
+        <div style="background: #f8f9fa; padding: 30px; border-radius: 10px; margin-bottom: 30px;">
+            <p style="color: #333; font-size: 16px; line-height: 1.6; margin: 0 0 20px 0;">
+                New message in <strong style="color: #00AFCE;">"{event_title}"</strong> event chat
+            </p>
             
-            <div style="background: #f8f9fa; padding: 30px; border-radius: 10px; margin-bottom: 30px;">
-                <p style="color: #333; font-size: 16px; line-height: 1.6; margin: 0 0 20px 0;">
-                    New message in <strong style="color: #00AFCE;">"{event_title}"</strong> event chat
+            <div style="background: white; padding: 20px; border-radius: 8px; border-left: 4px solid #00AFCE; margin: 20px 0;">
+                <p style="color: #333; font-size: 16px; line-height: 1.6; margin: 0 0 10px 0;">
+                    <strong style="color: #1B365F;">From:</strong> {sender_name}
+                </p>
+                <p style="color: #333; font-size: 16px; line-height: 1.6; margin: 0 0 10px 0;">
+                    <strong style="color: #1B365F;">Message:</strong> "{notification.get('message', '')}"
+                </p>
+                <p style="color: #333; font-size: 16px; line-height: 1.6; margin: 0;">
+                    <strong style="color: #1B365F;">Event:</strong> {event_title} ({organization_name})
                 </p>
-                
-                <div style="background: white; padding: 20px; border-radius: 8px; border-left: 4px solid #00AFCE; margin: 20px 0;">
-                    <p style="color: #333; font-size: 16px; line-height: 1.6; margin: 0 0 10px 0;">
-                        <strong style="color: #1B365F;">From:</strong> {sender_name}
-                    </p>
-                    <p style="color: #333; font-size: 16px; line-height: 1.6; margin: 0 0 10px 0;">
-                        <strong style="color: #1B365F;">Message:</strong> "{notification.get('message', '')}"
-                    </p>
-                    <p style="color: #333; font-size: 16px; line-height: 1.6; margin: 0;">
-                        <strong style="color: #1B365F;">Event:</strong> {event_title} ({organization_name})
-                    </p>
-                </div>
-                
-                <div style="text-align: center; margin: 30px 0;">
-                    <a href="https://uplandmainstreet.org" style="background: #00AFCE; color: white; padding: 15px 30px; text-decoration: none; border-radius: 8px; font-weight: 600; display: inline-block; font-size: 16px;">
-                        View Full Conversation
-                    </a>
-                </div>
             </div>
             
-            <div style="border-top: 2px solid #E14F3D; margin-top: 30px; padding-top: 20px; text-align: center;">
-                <p style="color: #1B365F; margin: 0; font-size: 18px; font-weight: 600;">Main Street Connect</p>
-                <p style="color: #666; margin: 5px 0 0 0; font-size: 14px;">Connecting communities through meaningful volunteer opportunities</p>
+            <div style="text-align: center; margin: 30px 0;">
+                <a href="https://uplandmainstreet.org" style="background: #00AFCE; color: white; padding: 15px 30px; text-decoration: none; border-radius: 8px; font-weight: 600; display: inline-block; font-size: 16px;">
+                    View Full Conversation
+                </a>
             </div>
         </div>
-        """
         
-        # Send email using latest Resend API
-        email_response = resend_client.emails.send({
-            "from": "Main Street Connect <noreply@uplandmainstreet.org>",
-            "to": [notification['user_email']],
-            "subject": subject,
-            "html": html_content
-        })
+        <div style="border-top: 2px solid #E14F3D; margin-top: 30px; padding-top: 20px; text-align: center;">
+            <p style="color: #1B365F; margin: 0; font-size: 18px; font-weight: 600;">Main Street Connect</p>
+            <p style="color: #666; margin: 5px 0 0 0; font-size: 14px;">Connecting communities through meaningful volunteer opportunities</p>
+        </div>
+    </div>
+    """
+    
+    return {
+        "from": "Main Street Connect <noreply@uplandmainstreet.org>",
+        "to": [notification['user_email']],
+        "subject": subject,
+        "html": html_content
+    }
+
+def send_chat_notification_email(notification: Dict) -> bool:
+    """Send chat notification email using latest Resend API"""
+    try:
+        email_response = email_sender.send(resend.Emails.send, render_chat_notification_email(notification))
         
-        logger.info(f"Email sent successfully to {notification['user_email']}: {email_response.id}")
+        logger.info(f"Email sent successfully to {notification['user_email']}: {email_response['id']}")
         return True
         
     except Exception as e:
         logger.error(f"Error sending chat notification email to {notification.get('user_email', 'unknown')}: {e}")
         return False
 
-def mark_notification_sent(notification_id: str) -> bool:
-    """Mark notification as sent using the new function"""
-    connection = get_db_connection()
+def send_chat_notification_emails(notifications: List[Dict]) -> Dict[str, bool]:
+    """Send up to RESEND_BATCH_SIZE chat notification emails in one Resend batch request, reporting success per notification id"""
+    results = {str(notification['id']): False for notification in notifications}
+    
+    messages = []
+    for notification in notifications:
+        try:
+            messages.append((notification, render_chat_notification_email(notification)))
+        except Exception as e:
+            logger.error(f"Error rendering chat notification email for {notification.get('user_email', 'unknown')}: {e}")
+    if not messages:
+        return results
+    
+    try:
+        email_response = email_sender.send(resend.Batch.send, [params for _, params in messages])
+    except (resend.exceptions.ValidationError, resend.exceptions.MissingRequiredFieldsError) as e:
+        # Resend rejects the whole batch if any one message is invalid; send the rest on their own
+        logger.warning(f"Batch of {len(messages)} chat notification emails rejected ({e}); sending individually")
+        for notification, _ in messages:
+            results[str(notification['id'])] = send_chat_notification_email(notification)
+        return results
+    except Exception as e:
+        logger.error(f"Error sending batch of {len(messages)} chat notification emails: {e}")
+        return results
+    
+    # Batch results come back in the order the messages were sent
+    for (notification, _), email in zip(messages, email_response['data']):
+        results[str(notification['id'])] = True
+        logger.info(f"Email sent successfully to {notification['user_email']}: {email['id']}")
+    return results
+
+# Notifications marked as sent per statement; a crash can resend at most this many emails
+MARK_SENT_CHUNK_SIZE = int(os.getenv('MARK_SENT_CHUNK_SIZE', '100'))
+
+def mark_notifications_sent(notification_ids: List[str]) -> Dict[str, bool]:
+    """Mark a chunk of notifications as sent in one statement, reporting success per id"""
+    results = {str(notification_id): False for notification_id in notification_ids}
+    if not results:
+        return results
+    
+    connection = db_pool.getconn()
     if not connection:
-        return False
+        return results
     
     try:
         cursor = connection.cursor()
+        cursor.execute("SELECT mark_notifications_sent(%s::uuid[])", (list(results),))
+        for row in cursor.fetchall():
+            results[str(row[0])] = True
+        connection.commit()
         
-        # Use the new function
-        cursor.execute("SELECT mark_notification_sent(%s)", (notification_id,))
-        result = cursor.fetchone()
-        
-        if result and result[0]:
-            logger.info(f"Marked notification {notification_id} as sent")
-            connection.commit()
-            return True
-        else:
-            logger.warning(f"Failed to mark notification {notification_id} as sent")
-            return False
+        marked = sum(results.values())
+        logger.info(f"Marked {marked}/{len(results)} notifications as sent")
+        return results
         
     except Exception as e:
-        logger.error(f"Database error marking notification sent: {e}")
-        connection.rollback()
-        return False
+        logger.error(f"Database error marking notifications sent: {e}")
+        return {notification_id: False for notification_id in results}
     finally:
-        connection.close()
+        db_pool.putconn(connection)
 
 def process_chat_notifications():
     """Process all pending chat notifications with comprehensive error handling"""
@@ -257,42 +402,92 @@ def process_chat_notifications():
         logger.info("No pending notifications to process")
         return 0, 0
     
+    # Check which notifications we should send, for the whole batch at once
+    checked = get_notification_eligibility(notifications)
+    if checked is None:
+        logger.error("Could not check notification eligibility; leaving all notifications pending")
+        return 0, len(notifications)
+    eligibility, covered_by = checked
+    
     sent_count = 0
     error_count = 0
     skipped_count = 0
     
+    # Sent and skipped notifications waiting to be marked, as (index, notification, was_sent)
+    pending_marks = []
+    
+    def flush_marks():
+        """Mark the pending notifications as sent and count the results"""
+        nonlocal sent_count, error_count
+        marked = mark_notifications_sent([notification['id'] for _, notification, _ in pending_marks])
+        for i, notification, was_sent in pending_marks:
+            if marked[str(notification['id'])]:
+                if was_sent:
+                    sent_count += 1
+                    logger.info(f"Successfully processed notification {i}: {notification.get('user_email', 'unknown')}")
+            elif was_sent:
+                error_count += 1
+                logger.error(f"Failed to mark notification {i} as sent: {notification.get('user_email', 'unknown')}")
+            else:
+                logger.warning(f"Failed to mark skipped notification {i} as sent: {notification.get('user_email', 'unknown')}")
+        pending_marks.clear()
+    
+    # Eligible notifications to email, as (index, notification)
+    to_send = []
+    # Repeats waiting on an email earlier in this batch, keyed by its notification id
+    held_back = defaultdict(list)
     for i, notification in enumerate(notifications, 1):
+        notification_id = str(notification['id'])
+        if eligibility[notification_id]:
+            to_send.append((i, notification))
+        elif notification_id in covered_by:
+            held_back[covered_by[notification_id]].append((i, notification))
+        else:
+            skipped_count += 1
+            logger.info(f"Skipped notification {i}: {notification.get('user_email', 'unknown')} (preferences or recent activity)")
+            # Mark as sent to avoid reprocessing
+            pending_marks.append((i, notification, False))
+            if len(pending_marks) >= MARK_SENT_CHUNK_SIZE:
+                flush_marks()
+    
+    batches = [to_send[start:start + RESEND_BATCH_SIZE] for start in range(0, len(to_send), RESEND_BATCH_SIZE)]
+    
+    def send_batch(batch):
+        """Send one batch on a sender thread, returning its per-notification results or the error"""
         try:
-            logger.info(f"Processing notification {i}/{len(notifications)}: {notification.get('id', 'unknown')}")
-            
-            # Check if we should send this notification
-            if should_send_notification(
-                notification['user_id'], 
-                notification['event_id'], 
-                notification['chat_message_id']
-            ):
-                # Send the email
-                if send_chat_notification_email(notification):
-                    # Mark as sent
-                    if mark_notification_sent(notification['id']):
-                        sent_count += 1
-                        logger.info(f"Successfully processed notification {i}: {notification.get('user_email', 'unknown')}")
-                    else:
-                        error_count += 1
-                        logger.error(f"Failed to mark notification {i} as sent: {notification.get('user_email', 'unknown')}")
-                else:
-                    error_count += 1
-                    logger.error(f"Failed to send email for notification {i}: {notification.get('user_email', 'unknown')}")
-            else:
-                skipped_count += 1
-                logger.info(f"Skipped notification {i}: {notification.get('user_email', 'unknown')} (preferences or recent activity)")
-                # Mark as sent to avoid reprocessing
-                mark_notification_sent(notification['id'])
-                
+            logger.info(f"Sending notifications {batch[0][0]}-{batch[-1][0]}/{len(notifications)}")
+            return send_chat_notification_emails([notification for _, notification in batch])
         except Exception as e:
-            error_count += 1
-            logger.error(f"Error processing notification {i}: {e}")
+            return e
+    
+    # Batches are sent concurrently under the shared Resend rate limit, and marked here as each completes
+    for batch, results in zip(batches, email_sender.map(send_batch, batches)):
+        if isinstance(results, Exception):
+            error_count += len(batch)
+            logger.error(f"Error processing notifications {batch[0][0]}-{batch[-1][0]}: {results}")
             continue
+        
+        # Mark the batch right away so a crash resends as little as possible
+        for i, notification in batch:
+            notification_id = str(notification['id'])
+            if results[notification_id]:
+                pending_marks.append((i, notification, True))
+                # Its repeats in this batch are covered now that it has been sent
+                for j, repeat in held_back.pop(notification_id, []):
+                    skipped_count += 1
+                    logger.info(f"Skipped notification {j}: {repeat.get('user_email', 'unknown')} (already emailed in this run)")
+                    pending_marks.append((j, repeat, False))
+            else:
+                error_count += 1
+                logger.error(f"Failed to send email for notification {i}: {notification.get('user_email', 'unknown')}")
+        flush_marks()
+    
+    flush_marks()
+    
+    # Repeats of emails that failed stay pending, so the next run can send them instead
+    held_count = sum(len(repeats) for repeats in held_back.values())
+    if held_count:
+        logger.warning(f"Left {held_count} notifications pending because the email they repeat was not sent")
     
     processing_time = datetime.now() - start_time
     logger.info(f"Processing complete in {processing_time.total_seconds():.2f}s: {sent_count} sent, {skipped_count} skipped, {error_count} errors")
@@ -301,7 +496,7 @@ def process_chat_notifications():
 
 def get_notification_stats():
     """Get notification processing statistics"""
-    connection = get_db_connection()
+    connection = db_pool.getconn()
     if not connection:
         return None
     
@@ -322,7 +517,7 @@ def get_notification_stats():
         logger.error(f"Error getting notification stats: {e}")
         return None
     finally:
-        connection.close()
+        db_pool.putconn(connection)
 
 if __name__ == "__main__":
     try:
@@ -347,4 +542,6 @@ if __name__ == "__main__":
             
     except Exception as e:
         logger.error(f"Critical error in main execution: {e}")
-        sys.exit(1) 
\ No newline at end of file
+        sys.exit(1)
+    finally:
+        db_pool.closeall() 
\ No newline at end of file
@@ -5,6 +5,7 @@ import random
 import string
 import psycopg2
 from datetime import datetime, timedelta, timezone
+from rate_limited_sender import email_sender
 
 # Get API key from environment variable or use default
 resend.api_key = os.getenv('RESEND_API_KEY', "re_e32x6j2U_Mx5KLTyeAW5oBVYPftpDnH92")
@@ -114,7 +115,7 @@ def send_password_reset_email(email, reset_code):
         }
 
         print(f"Sending password reset email to: {email}")
-        email_response = resend.Emails.send(params)
+        email_response = email_sender.send(resend.Emails.send, params)
         print("Email sent successfully:", email_response)
         return True
 
@@ -3,6 +3,7 @@ import os
 import sys
 import random
 import string
+from rate_limited_sender import email_sender
 
 # Get API key from environment variable or use default
 resend.api_key = os.getenv('RESEND_API_KEY', "re_e32x6j2U_Mx5KLTyeAW5oBVYPftpDnH92")
@@ -57,7 +58,7 @@ def send_verification_email(email, verification_code):
         }
 
         print(f"Sending verification email to: {email}")
-        email_response = resend.Emails.send(params)
+        email_response = email_sender.send(resend.Emails.send, params)
         print("Email sent successfully:", email_response)
         return True
 
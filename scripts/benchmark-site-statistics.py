@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Benchmark calculating statistics from tables in api/site-statistics.py
+Runs the shipped path (scan_signups paging user_events through iter_table_rows, then
+fetch_in_chunks and sum_signup_hours) against an in-memory stand-in for the Supabase
+client, so no database is needed:
+
+    python scripts/benchmark-site-statistics.py --signups 1000000
+"""
+
+import argparse
+import importlib.util
+import os
+import random
+import time
+import tracemalloc
+import uuid
+from types import SimpleNamespace
+
+# The handler module creates a Supabase client on import, which does not connect until used
+module_path = os.path.join(os.path.dirname(__file__), '..', 'api', 'site-statistics.py')
+spec = importlib.util.spec_from_file_location('site_statistics', module_path)
+site_statistics = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(site_statistics)
+
+class FakeQuery:
+    """Answers the keyset-paged and in_() queries the statistics scan makes"""
+
+    def __init__(self, table):
+        self.table = table
+        self.after = None
+        self.page_size = None
+        self.ids = None
+
+    def select(self, columns):
+        return self
+
+    def order(self, column):
+        return self
+
+    def limit(self, count):
+        self.page_size = count
+        return self
+
+    def gt(self, column, value):
+        self.after = value
+        return self
+
+    def in_(self, column, values):
+        self.ids = set(values)
+        return self
+
+    def execute(self):
+        return SimpleNamespace(data=self.table.rows(self))
+
+class FakeSignups:
+    """user_events, generated one page at a time like PostgREST returns them"""
+
+    def __init__(self, count, user_ids, event_ids, seed):
+        self.count = count
+        self.user_ids = user_ids
+        self.event_ids = event_ids
+        self.seed = seed
+
+    def rows(self, query):
+        start = 0 if query.after is None else query.after + 1
+        generator = random.Random(self.seed + start)
+        return [
+            {
+                'id': index,
+                'user_id': generator.choice(self.user_ids),
+                'event_id': generator.choice(self.event_ids)
+            }
+            for index in range(start, min(self.count, start + query.page_size))
+        ]
+
+class FakeEvents:
+    """events with a duration between 1 and 6 hours"""
+
+    def __init__(self, event_ids, seed):
+        generator = random.Random(seed)
+        self.events = {event_id: {'id': event_id, 'duration_hours': generator.randint(1, 6)} for event_id in event_ids}
+
+    def rows(self, query):
+        return [self.events[event_id] for event_id in query.ids if event_id in self.events]
+
+class FakeClient:
+    """Just enough of the Supabase client for the scan: table(name) starts a query"""
+
+    def __init__(self, tables):
+        self.tables = tables
+
+    def table(self, name):
+        return FakeQuery(self.tables[name])
+
+def calculate():
+    """Active volunteers and hours contributed, as calculate_statistics computes them"""
+    unique_user_ids, event_signups = site_statistics.scan_signups()
+    events = site_statistics.fetch_in_chunks('events', 'id, duration_hours', 'id', event_signups)
+    return len(unique_user_ids), site_statistics.sum_signup_hours(event_signups, events)
+
+def measure():
+    """Run the calculation once for time and once under tracemalloc for peak memory"""
+    started = time.perf_counter()
+    result = calculate()
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    calculate()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return result, elapsed, peak
+
+def main():
+    """Main function"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--signups', type=int, default=1_000_000)
+    parser.add_argument('--volunteers', type=int, default=100_000)
+    parser.add_argument('--events', type=int, default=10_000)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    generator = random.Random(args.seed)
+    user_ids = [str(uuid.UUID(int=generator.getrandbits(128))) for _ in range(args.volunteers)]
+    event_ids = [str(uuid.UUID(int=generator.getrandbits(128))) for _ in range(args.events)]
+    site_statistics.supabase = FakeClient({
+        'user_events': FakeSignups(args.signups, user_ids, event_ids, args.seed),
+        'events': FakeEvents(event_ids, args.seed)
+    })
+
+    print(f"{args.signups:,} signups, {args.volunteers:,} volunteers, {args.events:,} events, "
+          f"{site_statistics.SCAN_PAGE_SIZE:,} rows per page")
+    (active_volunteers, hours_contributed), elapsed, peak = measure()
+    print(f"streaming: {elapsed:6.2f}s  peak {peak / 1024 / 1024:8.1f} MiB  "
+          f"volunteers={active_volunteers:,} hours={hours_contributed:,}")
+    print("Time includes generating the synthetic pages; peak memory is the volunteer set, "
+          "per-event counts and one page of rows")
+
+if __name__ == "__main__":
+    main()
@@ -1433,9 +1433,18 @@ app.post('/api/contact-form', async (req, res) => {
 // Content management API routes
 app.get('/api/content', async (req, res) => {
   try {
-    const { data: content, error } = await supabase
+    let query = supabase
       .from('content')
-      .select('*')
+      .select('*');
+
+    // Same equality filters as api/content.py
+    for (const column of ['page', 'section', 'language_code']) {
+      if (req.query[column]) {
+        query = query.eq(column, req.query[column]);
+      }
+    }
+
+    const { data: content, error } = await query
       .order('page')
       .order('section')
       .order('key');
@@ -413,18 +413,13 @@ export const useContentAdmin = () => {
   const getAllContent = useCallback(async (languageCode: string = 'en') => {
     setLoading(true);
     try {
-      const response = await fetch('http://localhost:3001/api/content');
+      // Let the API filter by language code instead of downloading every translation
+      const url = languageCode === 'en'
+        ? 'http://localhost:3001/api/content'
+        : `http://localhost:3001/api/content?language_code=${encodeURIComponent(languageCode)}`;
+      const response = await fetch(url);
       const result = await response.json();
-      
-      if (result.success && result.data) {
-        // Filter by language code if needed
-        const filteredData = languageCode === 'en' 
-          ? result.data 
-          : result.data.filter((item: any) => item.language_code === languageCode);
-        
-        return { success: true, data: filteredData };
-      }
-      
+
       return result;
     } catch (error) {
       console.error('Error fetching content:', error);
@@ -28,4 +28,19 @@ SELECT cron.schedule(
 SELECT * FROM cron.job WHERE jobname = 'process-chat-notifications';
 
 -- To remove the cron job (for maintenance), uncomment the line below:
--- SELECT cron.unschedule('process-chat-notifications');
\ No newline at end of file
+-- SELECT cron.unschedule('process-chat-notifications');
+
+-- Prune content tombstones older than the delta sync window once a day
+SELECT cron.schedule(
+  'prune-content-tombstones',
+  '0 4 * * *', -- Every day at 04:00
+  $$ SELECT public.prune_content_tombstones(); $$
+);
+
+-- Fold new signups into the persisted site statistics every 10 minutes
+-- GET /api/site-statistics only reads site_stats; POST recalculates on demand
+SELECT cron.schedule(
+  'fold-site-statistics',
+  '*/10 * * * *', -- Every 10 minutes
+  $$ SELECT public.fold_site_statistics(); $$
+);
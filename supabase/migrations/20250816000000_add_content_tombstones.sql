@@ -0,0 +1,68 @@
+-- Record deleted content rows so clients can sync content incrementally
+-- GET /api/content?since=<timestamp> returns rows updated after the timestamp plus these tombstones
+
+CREATE TABLE IF NOT EXISTS public.content_tombstones (
+  id UUID NOT NULL PRIMARY KEY,
+  page TEXT NOT NULL,
+  section TEXT NOT NULL,
+  key TEXT NOT NULL,
+  language_code TEXT NOT NULL DEFAULT 'en',
+  deleted_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_content_tombstones_deleted_at ON public.content_tombstones(deleted_at);
+
+-- Delta queries filter content on updated_at
+CREATE INDEX IF NOT EXISTS idx_content_updated_at ON public.content(updated_at);
+
+-- Enable Row Level Security
+ALTER TABLE public.content_tombstones ENABLE ROW LEVEL SECURITY;
+
+-- Tombstones expose nothing beyond what the content table already did
+CREATE POLICY "Content tombstones are viewable by everyone"
+ON public.content_tombstones
+FOR SELECT
+USING (true);
+
+-- Write a tombstone whenever a content row is deleted
+CREATE OR REPLACE FUNCTION public.record_content_tombstone()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+  INSERT INTO public.content_tombstones (id, page, section, key, language_code, deleted_at)
+  VALUES (OLD.id, OLD.page, OLD.section, OLD.key, OLD.language_code, now())
+  ON CONFLICT (id) DO UPDATE SET deleted_at = EXCLUDED.deleted_at;
+
+  RETURN OLD;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS record_content_tombstone ON public.content;
+CREATE TRIGGER record_content_tombstone
+  AFTER DELETE ON public.content
+  FOR EACH ROW
+  EXECUTE FUNCTION public.record_content_tombstone();
+
+-- Tombstones are only kept for the delta window; older clients do a full resync
+CREATE OR REPLACE FUNCTION public.prune_content_tombstones(retention INTERVAL DEFAULT INTERVAL '30 days')
+RETURNS INTEGER
+LANGUAGE sql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+  WITH pruned AS (
+    DELETE FROM public.content_tombstones
+    WHERE deleted_at < now() - retention
+    RETURNING 1
+  )
+  SELECT COUNT(*)::INTEGER FROM pruned;
+$$;
+
+GRANT SELECT ON public.content_tombstones TO anon;
+GRANT SELECT ON public.content_tombstones TO authenticated;
+
+-- Pruning is left to the scheduled job; clients must not be able to drop the delete history
+REVOKE EXECUTE ON FUNCTION public.prune_content_tombstones(INTERVAL) FROM PUBLIC, anon, authenticated;
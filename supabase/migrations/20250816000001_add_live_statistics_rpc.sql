@@ -0,0 +1,26 @@
+-- Live statistics in a single round-trip
+-- api/statistics.py used to download every profile row just to count them
+
+-- Counting profiles by user_type uses this index instead of a full table scan
+CREATE INDEX IF NOT EXISTS idx_profiles_user_type ON public.profiles(user_type);
+
+CREATE OR REPLACE FUNCTION public.get_live_statistics()
+RETURNS TABLE(
+  active_volunteers INTEGER,
+  hours_contributed INTEGER,
+  partner_organizations INTEGER
+)
+LANGUAGE sql
+STABLE SECURITY DEFINER
+SET search_path = public
+AS $$
+  SELECT
+    -- Actual users only, excluding organizations (same rule as the admin dashboard)
+    (SELECT COUNT(*) FROM public.profiles WHERE user_type != 'organization')::INTEGER,
+    -- Each signup counts as the default 2 hours
+    (SELECT COUNT(*) * 2 FROM public.user_events)::INTEGER,
+    (SELECT COUNT(*) FROM public.organizations)::INTEGER;
+$$;
+
+GRANT EXECUTE ON FUNCTION public.get_live_statistics() TO anon;
+GRANT EXECUTE ON FUNCTION public.get_live_statistics() TO authenticated;
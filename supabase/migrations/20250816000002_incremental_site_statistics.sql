@@ -0,0 +1,205 @@
+-- Incremental site statistics
+-- Signups and removals are logged by a trigger and folded into running counters, so a
+-- recalculation only touches what changed since the last one instead of every signup ever made.
+--
+-- site_stats.watermark records the last change folded in. The change log is consumed with
+-- DELETE ... RETURNING rather than read by id > watermark, so a change whose transaction
+-- commits after a later id has been folded is still picked up by the next fold.
+
+ALTER TABLE public.site_stats
+ADD COLUMN IF NOT EXISTS watermark BIGINT NOT NULL DEFAULT 0;
+
+-- Pending signup changes: +1 for a signup, -1 for a removal
+CREATE TABLE IF NOT EXISTS public.user_event_changes (
+  id BIGSERIAL PRIMARY KEY,
+  user_id UUID NOT NULL,
+  event_id UUID NOT NULL,
+  delta SMALLINT NOT NULL,
+  created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()
+);
+
+-- Running counters: signups per volunteer and per event (rows are removed when they reach 0)
+CREATE TABLE IF NOT EXISTS public.site_stats_volunteer_signups (
+  user_id UUID NOT NULL PRIMARY KEY,
+  signups INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS public.site_stats_event_signups (
+  event_id UUID NOT NULL PRIMARY KEY,
+  signups INTEGER NOT NULL
+);
+
+-- Only the SECURITY DEFINER functions below touch these tables
+ALTER TABLE public.user_event_changes ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.site_stats_volunteer_signups ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.site_stats_event_signups ENABLE ROW LEVEL SECURITY;
+
+-- Log every signup change
+CREATE OR REPLACE FUNCTION public.record_user_event_change()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+  IF TG_OP IN ('DELETE', 'UPDATE') THEN
+    INSERT INTO public.user_event_changes (user_id, event_id, delta)
+    VALUES (OLD.user_id, OLD.event_id, -1);
+  END IF;
+
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    INSERT INTO public.user_event_changes (user_id, event_id, delta)
+    VALUES (NEW.user_id, NEW.event_id, 1);
+  END IF;
+
+  RETURN COALESCE(NEW, OLD);
+END;
+$$;
+
+-- The old triggers recalculated every statistic from scratch on each row change
+DROP TRIGGER IF EXISTS update_statistics_on_user_events ON public.user_events;
+DROP TRIGGER IF EXISTS update_statistics_on_events ON public.events;
+
+DROP TRIGGER IF EXISTS record_user_event_change ON public.user_events;
+CREATE TRIGGER record_user_event_change
+  AFTER INSERT OR DELETE OR UPDATE OF user_id, event_id ON public.user_events
+  FOR EACH ROW
+  EXECUTE FUNCTION public.record_user_event_change();
+
+-- Write calculated values from the running counters
+-- Hours: every event with at least one signup, its duration rounded down (minimum 1), or 2 hours if unset
+CREATE OR REPLACE FUNCTION public.write_site_statistics_from_counters(p_watermark BIGINT)
+RETURNS VOID
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+  UPDATE public.site_stats s
+  SET
+    calculated_value = CASE s.stat_type
+      WHEN 'active_volunteers' THEN (
+        SELECT COUNT(*) FROM public.site_stats_volunteer_signups
+      )
+      WHEN 'hours_contributed' THEN (
+        SELECT COALESCE(SUM(
+          CASE
+            WHEN e.arrival_time IS NOT NULL AND e.estimated_end_time IS NOT NULL THEN
+              GREATEST(1, TRUNC(EXTRACT(EPOCH FROM (e.estimated_end_time - e.arrival_time)) / 3600))
+            ELSE 2
+          END
+        ), 0)
+        FROM public.site_stats_event_signups es
+        JOIN public.events e ON e.id = es.event_id
+      )
+      WHEN 'partner_organizations' THEN (
+        SELECT COUNT(DISTINCT e.organization_id)
+        FROM public.events e
+        WHERE e.organization_id IS NOT NULL
+      )
+    END::INTEGER,
+    watermark = COALESCE(p_watermark, s.watermark),
+    last_calculated_at = now()
+  WHERE s.stat_type IN ('active_volunteers', 'hours_contributed', 'partner_organizations');
+END;
+$$;
+
+-- Fold pending signup changes into the running counters
+CREATE OR REPLACE FUNCTION public.fold_site_statistics()
+RETURNS TABLE(
+  stat_type TEXT,
+  calculated_value INTEGER,
+  manual_override INTEGER,
+  display_value INTEGER,
+  last_calculated_at TIMESTAMP WITH TIME ZONE
+)
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+#variable_conflict use_column
+DECLARE
+  folded_through BIGINT;
+BEGIN
+  -- Serialize folds and rebuilds so each change is applied exactly once
+  PERFORM 1 FROM public.site_stats s WHERE s.stat_type = 'active_volunteers' FOR UPDATE;
+
+  WITH consumed AS (
+    DELETE FROM public.user_event_changes c
+    RETURNING c.id, c.user_id, c.event_id, c.delta
+  ),
+  volunteer_deltas AS (
+    INSERT INTO public.site_stats_volunteer_signups AS v (user_id, signups)
+    SELECT c.user_id, SUM(c.delta) FROM consumed c GROUP BY c.user_id
+    ON CONFLICT (user_id) DO UPDATE SET signups = v.signups + EXCLUDED.signups
+    RETURNING 1
+  ),
+  event_deltas AS (
+    INSERT INTO public.site_stats_event_signups AS es (event_id, signups)
+    SELECT c.event_id, SUM(c.delta) FROM consumed c GROUP BY c.event_id
+    ON CONFLICT (event_id) DO UPDATE SET signups = es.signups + EXCLUDED.signups
+    RETURNING 1
+  )
+  SELECT MAX(c.id) INTO folded_through FROM consumed c;
+
+  DELETE FROM public.site_stats_volunteer_signups v WHERE v.signups <= 0;
+  DELETE FROM public.site_stats_event_signups es WHERE es.signups <= 0;
+
+  PERFORM public.write_site_statistics_from_counters(folded_through);
+
+  RETURN QUERY SELECT * FROM public.get_all_site_statistics();
+END;
+$$;
+
+-- Rebuild the running counters from user_events (explicit admin action)
+CREATE OR REPLACE FUNCTION public.rebuild_site_statistics()
+RETURNS TABLE(
+  stat_type TEXT,
+  calculated_value INTEGER,
+  manual_override INTEGER,
+  display_value INTEGER,
+  last_calculated_at TIMESTAMP WITH TIME ZONE
+)
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+#variable_conflict use_column
+DECLARE
+  rebuilt_through BIGINT;
+BEGIN
+  PERFORM 1 FROM public.site_stats s WHERE s.stat_type = 'active_volunteers' FOR UPDATE;
+
+  DELETE FROM public.site_stats_volunteer_signups;
+  DELETE FROM public.site_stats_event_signups;
+
+  -- One statement, so the cleared log and the recounted signups come from the same snapshot
+  WITH cleared AS (
+    DELETE FROM public.user_event_changes c
+    RETURNING c.id
+  ),
+  volunteer_counts AS (
+    INSERT INTO public.site_stats_volunteer_signups (user_id, signups)
+    SELECT ue.user_id, COUNT(*) FROM public.user_events ue GROUP BY ue.user_id
+    RETURNING 1
+  ),
+  event_counts AS (
+    INSERT INTO public.site_stats_event_signups (event_id, signups)
+    SELECT ue.event_id, COUNT(*) FROM public.user_events ue GROUP BY ue.event_id
+    RETURNING 1
+  )
+  SELECT MAX(c.id) INTO rebuilt_through FROM cleared c;
+
+  PERFORM public.write_site_statistics_from_counters(rebuilt_through);
+
+  RETURN QUERY SELECT * FROM public.get_all_site_statistics();
+END;
+$$;
+
+-- Recalculation is done with the service role from api/site-statistics.py
+REVOKE EXECUTE ON FUNCTION public.write_site_statistics_from_counters(BIGINT) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION public.fold_site_statistics() FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION public.rebuild_site_statistics() FROM PUBLIC, anon, authenticated;
+
+-- Initialize the counters from the current signups
+SELECT public.rebuild_site_statistics();
@@ -0,0 +1,53 @@
+-- Precomputed event durations for "hours contributed"
+-- Each signup contributes its event's duration, so hours are one join-and-sum over the
+-- per-event signup counters instead of parsing event times on every recalculation.
+
+-- Duration in whole hours, rounded down (minimum 1), or 2 hours if the event has no times.
+-- A stored generated column is recomputed by Postgres whenever arrival_time or estimated_end_time changes.
+ALTER TABLE public.events
+ADD COLUMN IF NOT EXISTS duration_hours INTEGER GENERATED ALWAYS AS (
+  CASE
+    WHEN arrival_time IS NOT NULL AND estimated_end_time IS NOT NULL THEN
+      GREATEST(1, FLOOR(EXTRACT(EPOCH FROM (estimated_end_time - arrival_time)) / 3600))::INTEGER
+    ELSE 2
+  END
+) STORED;
+
+-- Lets the hours join read durations from the index alone
+CREATE INDEX IF NOT EXISTS idx_events_id_duration_hours ON public.events(id) INCLUDE (duration_hours);
+
+-- Hours: every signup counts its event's duration
+CREATE OR REPLACE FUNCTION public.write_site_statistics_from_counters(p_watermark BIGINT)
+RETURNS VOID
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+  UPDATE public.site_stats s
+  SET
+    calculated_value = CASE s.stat_type
+      WHEN 'active_volunteers' THEN (
+        SELECT COUNT(*) FROM public.site_stats_volunteer_signups
+      )
+      WHEN 'hours_contributed' THEN (
+        SELECT COALESCE(SUM(es.signups::BIGINT * e.duration_hours), 0)
+        FROM public.site_stats_event_signups es
+        JOIN public.events e ON e.id = es.event_id
+      )
+      WHEN 'partner_organizations' THEN (
+        SELECT COUNT(DISTINCT e.organization_id)
+        FROM public.events e
+        WHERE e.organization_id IS NOT NULL
+      )
+    END::INTEGER,
+    watermark = COALESCE(p_watermark, s.watermark),
+    last_calculated_at = now()
+  WHERE s.stat_type IN ('active_volunteers', 'hours_contributed', 'partner_organizations');
+END;
+$$;
+
+REVOKE EXECUTE ON FUNCTION public.write_site_statistics_from_counters(BIGINT) FROM PUBLIC, anon, authenticated;
+
+-- Recount hours under the per-signup rule
+SELECT public.rebuild_site_statistics();
@@ -0,0 +1,215 @@
+-- Daily rollup buckets for time-window statistics
+-- Folding the signup change log also maintains per-day counters, so a window such as the
+-- last 30 days is answered from its days' buckets instead of scanning user_events.
+--
+-- Buckets keep signups per (day, event) and per (day, volunteer). Hours and partner
+-- organizations are joined from events on read, so event edits need no bucket updates, and
+-- distinct volunteers are counted over the union of the days' volunteers, so a volunteer
+-- active on several days of a window is still counted once.
+
+-- Signups are bucketed by the UTC day they were made
+ALTER TABLE public.user_event_changes
+ADD COLUMN IF NOT EXISTS signup_day DATE NOT NULL DEFAULT (now() AT TIME ZONE 'UTC')::DATE;
+
+CREATE TABLE IF NOT EXISTS public.site_stats_daily_events (
+  day DATE NOT NULL,
+  event_id UUID NOT NULL,
+  signups INTEGER NOT NULL,
+  PRIMARY KEY (day, event_id)
+);
+
+CREATE TABLE IF NOT EXISTS public.site_stats_daily_volunteers (
+  day DATE NOT NULL,
+  user_id UUID NOT NULL,
+  signups INTEGER NOT NULL,
+  PRIMARY KEY (day, user_id)
+);
+
+ALTER TABLE public.site_stats_daily_events ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.site_stats_daily_volunteers ENABLE ROW LEVEL SECURITY;
+
+-- Log every signup change with the day it counts towards
+CREATE OR REPLACE FUNCTION public.record_user_event_change()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+  IF TG_OP IN ('DELETE', 'UPDATE') THEN
+    INSERT INTO public.user_event_changes (user_id, event_id, delta, signup_day)
+    VALUES (OLD.user_id, OLD.event_id, -1, (COALESCE(OLD.signed_up_at, now()) AT TIME ZONE 'UTC')::DATE);
+  END IF;
+
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    INSERT INTO public.user_event_changes (user_id, event_id, delta, signup_day)
+    VALUES (NEW.user_id, NEW.event_id, 1, (COALESCE(NEW.signed_up_at, now()) AT TIME ZONE 'UTC')::DATE);
+  END IF;
+
+  RETURN COALESCE(NEW, OLD);
+END;
+$$;
+
+-- Moving a signup to another day moves it between buckets
+DROP TRIGGER IF EXISTS record_user_event_change ON public.user_events;
+CREATE TRIGGER record_user_event_change
+  AFTER INSERT OR DELETE OR UPDATE OF user_id, event_id, signed_up_at ON public.user_events
+  FOR EACH ROW
+  EXECUTE FUNCTION public.record_user_event_change();
+
+-- Fold pending signup changes into the running counters and the daily buckets
+CREATE OR REPLACE FUNCTION public.fold_site_statistics()
+RETURNS TABLE(
+  stat_type TEXT,
+  calculated_value INTEGER,
+  manual_override INTEGER,
+  display_value INTEGER,
+  last_calculated_at TIMESTAMP WITH TIME ZONE
+)
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+#variable_conflict use_column
+DECLARE
+  folded_through BIGINT;
+BEGIN
+  -- Serialize folds and rebuilds so each change is applied exactly once
+  PERFORM 1 FROM public.site_stats s WHERE s.stat_type = 'active_volunteers' FOR UPDATE;
+
+  WITH consumed AS (
+    DELETE FROM public.user_event_changes c
+    RETURNING c.id, c.user_id, c.event_id, c.delta, c.signup_day
+  ),
+  volunteer_deltas AS (
+    INSERT INTO public.site_stats_volunteer_signups AS v (user_id, signups)
+    SELECT c.user_id, SUM(c.delta) FROM consumed c GROUP BY c.user_id
+    ON CONFLICT (user_id) DO UPDATE SET signups = v.signups + EXCLUDED.signups
+    RETURNING 1
+  ),
+  event_deltas AS (
+    INSERT INTO public.site_stats_event_signups AS es (event_id, signups)
+    SELECT c.event_id, SUM(c.delta) FROM consumed c GROUP BY c.event_id
+    ON CONFLICT (event_id) DO UPDATE SET signups = es.signups + EXCLUDED.signups
+    RETURNING 1
+  ),
+  daily_event_deltas AS (
+    INSERT INTO public.site_stats_daily_events AS de (day, event_id, signups)
+    SELECT c.signup_day, c.event_id, SUM(c.delta) FROM consumed c GROUP BY c.signup_day, c.event_id
+    ON CONFLICT (day, event_id) DO UPDATE SET signups = de.signups + EXCLUDED.signups
+    RETURNING 1
+  ),
+  daily_volunteer_deltas AS (
+    INSERT INTO public.site_stats_daily_volunteers AS dv (day, user_id, signups)
+    SELECT c.signup_day, c.user_id, SUM(c.delta) FROM consumed c GROUP BY c.signup_day, c.user_id
+    ON CONFLICT (day, user_id) DO UPDATE SET signups = dv.signups + EXCLUDED.signups
+    RETURNING 1
+  )
+  SELECT MAX(c.id) INTO folded_through FROM consumed c;
+
+  DELETE FROM public.site_stats_volunteer_signups v WHERE v.signups <= 0;
+  DELETE FROM public.site_stats_event_signups es WHERE es.signups <= 0;
+  DELETE FROM public.site_stats_daily_events de WHERE de.signups <= 0;
+  DELETE FROM public.site_stats_daily_volunteers dv WHERE dv.signups <= 0;
+
+  PERFORM public.write_site_statistics_from_counters(folded_through);
+
+  RETURN QUERY SELECT * FROM public.get_all_site_statistics();
+END;
+$$;
+
+-- Rebuild the running counters and daily buckets from user_events (explicit admin action)
+CREATE OR REPLACE FUNCTION public.rebuild_site_statistics()
+RETURNS TABLE(
+  stat_type TEXT,
+  calculated_value INTEGER,
+  manual_override INTEGER,
+  display_value INTEGER,
+  last_calculated_at TIMESTAMP WITH TIME ZONE
+)
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+#variable_conflict use_column
+DECLARE
+  rebuilt_through BIGINT;
+BEGIN
+  PERFORM 1 FROM public.site_stats s WHERE s.stat_type = 'active_volunteers' FOR UPDATE;
+
+  DELETE FROM public.site_stats_volunteer_signups;
+  DELETE FROM public.site_stats_event_signups;
+  DELETE FROM public.site_stats_daily_events;
+  DELETE FROM public.site_stats_daily_volunteers;
+
+  -- One statement, so the cleared log and the recounted signups come from the same snapshot
+  WITH cleared AS (
+    DELETE FROM public.user_event_changes c
+    RETURNING c.id
+  ),
+  signups AS (
+    SELECT ue.user_id, ue.event_id, (COALESCE(ue.signed_up_at, now()) AT TIME ZONE 'UTC')::DATE AS day
+    FROM public.user_events ue
+  ),
+  volunteer_counts AS (
+    INSERT INTO public.site_stats_volunteer_signups (user_id, signups)
+    SELECT su.user_id, COUNT(*) FROM signups su GROUP BY su.user_id
+    RETURNING 1
+  ),
+  event_counts AS (
+    INSERT INTO public.site_stats_event_signups (event_id, signups)
+    SELECT su.event_id, COUNT(*) FROM signups su GROUP BY su.event_id
+    RETURNING 1
+  ),
+  daily_event_counts AS (
+    INSERT INTO public.site_stats_daily_events (day, event_id, signups)
+    SELECT su.day, su.event_id, COUNT(*) FROM signups su GROUP BY su.day, su.event_id
+    RETURNING 1
+  ),
+  daily_volunteer_counts AS (
+    INSERT INTO public.site_stats_daily_volunteers (day, user_id, signups)
+    SELECT su.day, su.user_id, COUNT(*) FROM signups su GROUP BY su.day, su.user_id
+    RETURNING 1
+  )
+  SELECT MAX(c.id) INTO rebuilt_through FROM cleared c;
+
+  PERFORM public.write_site_statistics_from_counters(rebuilt_through);
+
+  RETURN QUERY SELECT * FROM public.get_all_site_statistics();
+END;
+$$;
+
+-- Statistics for signups made between two UTC days (inclusive), read from the daily buckets
+-- Changes not yet folded by the scheduled job are not included
+CREATE OR REPLACE FUNCTION public.get_site_statistics_for_period(p_start DATE, p_end DATE)
+RETURNS TABLE(
+  signups INTEGER,
+  active_volunteers INTEGER,
+  hours_contributed INTEGER,
+  partner_organizations INTEGER
+)
+LANGUAGE sql
+STABLE
+SECURITY DEFINER
+SET search_path = public
+AS $$
+  SELECT
+    COALESCE(SUM(de.signups), 0)::INTEGER,
+    (
+      SELECT COUNT(DISTINCT dv.user_id)
+      FROM public.site_stats_daily_volunteers dv
+      WHERE dv.day BETWEEN p_start AND p_end
+    )::INTEGER,
+    COALESCE(SUM(de.signups::BIGINT * e.duration_hours), 0)::INTEGER,
+    COUNT(DISTINCT e.organization_id)::INTEGER
+  FROM public.site_stats_daily_events de
+  JOIN public.events e ON e.id = de.event_id
+  WHERE de.day BETWEEN p_start AND p_end;
+$$;
+
+REVOKE EXECUTE ON FUNCTION public.fold_site_statistics() FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION public.rebuild_site_statistics() FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.get_site_statistics_for_period(DATE, DATE) TO anon, authenticated;
+
+-- Backfill the daily buckets from the current signups
+SELECT public.rebuild_site_statistics();
@@ -0,0 +1,305 @@
+-- HyperLogLog sketches of active volunteers per day, site-wide and per organization
+-- Sketches of any set of days merge by taking the larger value of each register, so distinct
+-- volunteers over a window are estimated from (days x 2 KB) instead of from every signup.
+--
+-- 2048 one-byte registers give a standard error of about 2.3%. Sketches only grow: a
+-- cancelled signup still counts towards its day until the next rebuild.
+
+-- organization_id is the nil UUID for the site-wide sketch
+CREATE TABLE IF NOT EXISTS public.site_stats_daily_volunteer_sketches (
+  day DATE NOT NULL,
+  organization_id UUID NOT NULL,
+  registers BYTEA NOT NULL,
+  PRIMARY KEY (day, organization_id)
+);
+
+-- Register updates waiting to be merged into the sketches
+CREATE TABLE IF NOT EXISTS public.site_stats_sketch_updates (
+  day DATE NOT NULL,
+  organization_id UUID NOT NULL,
+  register INTEGER NOT NULL,
+  rank INTEGER NOT NULL
+);
+
+ALTER TABLE public.site_stats_daily_volunteer_sketches ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.site_stats_sketch_updates ENABLE ROW LEVEL SECURITY;
+
+-- Register a volunteer falls into (low 11 bits of the hash) and its rank
+-- (position of the first 1 bit in the remaining 53 bits)
+CREATE OR REPLACE FUNCTION public.volunteer_sketch_register(p_user_id UUID)
+RETURNS TABLE(register INTEGER, rank INTEGER)
+LANGUAGE sql
+IMMUTABLE
+AS $$
+  SELECT
+    (h & 2047)::INTEGER,
+    CASE WHEN w = 0 THEN 54 ELSE position('1' IN w::BIT(64)::TEXT) - 11 END
+  FROM (
+    SELECT h, (h >> 11) & 9007199254740991 AS w
+    FROM (SELECT hashtextextended(p_user_id::TEXT, 0) AS h) hashed
+  ) split;
+$$;
+
+-- Merge pending register updates into the stored sketches
+CREATE OR REPLACE FUNCTION public.merge_volunteer_sketch_updates()
+RETURNS VOID
+LANGUAGE sql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+  WITH consumed AS (
+    DELETE FROM public.site_stats_sketch_updates u
+    RETURNING u.day, u.organization_id, u.register, u.rank
+  ),
+  ranks AS (
+    SELECT c.day, c.organization_id, c.register, MAX(c.rank) AS rank
+    FROM consumed c
+    GROUP BY c.day, c.organization_id, c.register
+  ),
+  touched AS (
+    SELECT DISTINCT r.day, r.organization_id FROM ranks r
+  ),
+  registers AS (
+    SELECT t.day, t.organization_id, i.register,
+      GREATEST(COALESCE(get_byte(s.registers, i.register), 0), COALESCE(r.rank, 0)) AS rank
+    FROM touched t
+    CROSS JOIN generate_series(0, 2047) AS i(register)
+    LEFT JOIN public.site_stats_daily_volunteer_sketches s
+      ON s.day = t.day AND s.organization_id = t.organization_id
+    LEFT JOIN ranks r
+      ON r.day = t.day AND r.organization_id = t.organization_id AND r.register = i.register
+  )
+  INSERT INTO public.site_stats_daily_volunteer_sketches AS s (day, organization_id, registers)
+  SELECT g.day, g.organization_id, decode(string_agg(lpad(to_hex(g.rank), 2, '0'), '' ORDER BY g.register), 'hex')
+  FROM registers g
+  GROUP BY g.day, g.organization_id
+  ON CONFLICT (day, organization_id) DO UPDATE SET registers = EXCLUDED.registers;
+$$;
+
+-- Fold pending signup changes into the running counters, daily buckets and sketches
+CREATE OR REPLACE FUNCTION public.fold_site_statistics()
+RETURNS TABLE(
+  stat_type TEXT,
+  calculated_value INTEGER,
+  manual_override INTEGER,
+  display_value INTEGER,
+  last_calculated_at TIMESTAMP WITH TIME ZONE
+)
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+#variable_conflict use_column
+DECLARE
+  folded_through BIGINT;
+BEGIN
+  -- Serialize folds and rebuilds so each change is applied exactly once
+  PERFORM 1 FROM public.site_stats s WHERE s.stat_type = 'active_volunteers' FOR UPDATE;
+
+  WITH consumed AS (
+    DELETE FROM public.user_event_changes c
+    RETURNING c.id, c.user_id, c.event_id, c.delta, c.signup_day
+  ),
+  volunteer_deltas AS (
+    INSERT INTO public.site_stats_volunteer_signups AS v (user_id, signups)
+    SELECT c.user_id, SUM(c.delta) FROM consumed c GROUP BY c.user_id
+    ON CONFLICT (user_id) DO UPDATE SET signups = v.signups + EXCLUDED.signups
+    RETURNING 1
+  ),
+  event_deltas AS (
+    INSERT INTO public.site_stats_event_signups AS es (event_id, signups)
+    SELECT c.event_id, SUM(c.delta) FROM consumed c GROUP BY c.event_id
+    ON CONFLICT (event_id) DO UPDATE SET signups = es.signups + EXCLUDED.signups
+    RETURNING 1
+  ),
+  daily_event_deltas AS (
+    INSERT INTO public.site_stats_daily_events AS de (day, event_id, signups)
+    SELECT c.signup_day, c.event_id, SUM(c.delta) FROM consumed c GROUP BY c.signup_day, c.event_id
+    ON CONFLICT (day, event_id) DO UPDATE SET signups = de.signups + EXCLUDED.signups
+    RETURNING 1
+  ),
+  daily_volunteer_deltas AS (
+    INSERT INTO public.site_stats_daily_volunteers AS dv (day, user_id, signups)
+    SELECT c.signup_day, c.user_id, SUM(c.delta) FROM consumed c GROUP BY c.signup_day, c.user_id
+    ON CONFLICT (day, user_id) DO UPDATE SET signups = dv.signups + EXCLUDED.signups
+    RETURNING 1
+  ),
+  sketch_updates AS (
+    INSERT INTO public.site_stats_sketch_updates (day, organization_id, register, rank)
+    SELECT c.signup_day, scope.organization_id, r.register, MAX(r.rank)
+    FROM consumed c
+    LEFT JOIN public.events e ON e.id = c.event_id
+    CROSS JOIN LATERAL (VALUES ('00000000-0000-0000-0000-000000000000'::UUID), (e.organization_id)) AS scope(organization_id)
+    CROSS JOIN LATERAL public.volunteer_sketch_register(c.user_id) r
+    WHERE c.delta > 0 AND scope.organization_id IS NOT NULL
+    GROUP BY c.signup_day, scope.organization_id, r.register
+    RETURNING 1
+  )
+  SELECT MAX(c.id) INTO folded_through FROM consumed c;
+
+  DELETE FROM public.site_stats_volunteer_signups v WHERE v.signups <= 0;
+  DELETE FROM public.site_stats_event_signups es WHERE es.signups <= 0;
+  DELETE FROM public.site_stats_daily_events de WHERE de.signups <= 0;
+  DELETE FROM public.site_stats_daily_volunteers dv WHERE dv.signups <= 0;
+
+  PERFORM public.merge_volunteer_sketch_updates();
+  PERFORM public.write_site_statistics_from_counters(folded_through);
+
+  RETURN QUERY SELECT * FROM public.get_all_site_statistics();
+END;
+$$;
+
+-- Rebuild the running counters, daily buckets and sketches from user_events (explicit admin action)
+CREATE OR REPLACE FUNCTION public.rebuild_site_statistics()
+RETURNS TABLE(
+  stat_type TEXT,
+  calculated_value INTEGER,
+  manual_override INTEGER,
+  display_value INTEGER,
+  last_calculated_at TIMESTAMP WITH TIME ZONE
+)
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+#variable_conflict use_column
+DECLARE
+  rebuilt_through BIGINT;
+BEGIN
+  PERFORM 1 FROM public.site_stats s WHERE s.stat_type = 'active_volunteers' FOR UPDATE;
+
+  DELETE FROM public.site_stats_volunteer_signups;
+  DELETE FROM public.site_stats_event_signups;
+  DELETE FROM public.site_stats_daily_events;
+  DELETE FROM public.site_stats_daily_volunteers;
+  DELETE FROM public.site_stats_daily_volunteer_sketches;
+  DELETE FROM public.site_stats_sketch_updates;
+
+  -- One statement, so the cleared log and the recounted signups come from the same snapshot
+  WITH cleared AS (
+    DELETE FROM public.user_event_changes c
+    RETURNING c.id
+  ),
+  signups AS (
+    SELECT ue.user_id, ue.event_id, (COALESCE(ue.signed_up_at, now()) AT TIME ZONE 'UTC')::DATE AS day
+    FROM public.user_events ue
+  ),
+  volunteer_counts AS (
+    INSERT INTO public.site_stats_volunteer_signups (user_id, signups)
+    SELECT su.user_id, COUNT(*) FROM signups su GROUP BY su.user_id
+    RETURNING 1
+  ),
+  event_counts AS (
+    INSERT INTO public.site_stats_event_signups (event_id, signups)
+    SELECT su.event_id, COUNT(*) FROM signups su GROUP BY su.event_id
+    RETURNING 1
+  ),
+  daily_event_counts AS (
+    INSERT INTO public.site_stats_daily_events (day, event_id, signups)
+    SELECT su.day, su.event_id, COUNT(*) FROM signups su GROUP BY su.day, su.event_id
+    RETURNING 1
+  ),
+  daily_volunteer_counts AS (
+    INSERT INTO public.site_stats_daily_volunteers (day, user_id, signups)
+    SELECT su.day, su.user_id, COUNT(*) FROM signups su GROUP BY su.day, su.user_id
+    RETURNING 1
+  ),
+  sketch_updates AS (
+    INSERT INTO public.site_stats_sketch_updates (day, organization_id, register, rank)
+    SELECT su.day, scope.organization_id, r.register, MAX(r.rank)
+    FROM signups su
+    LEFT JOIN public.events e ON e.id = su.event_id
+    CROSS JOIN LATERAL (VALUES ('00000000-0000-0000-0000-000000000000'::UUID), (e.organization_id)) AS scope(organization_id)
+    CROSS JOIN LATERAL public.volunteer_sketch_register(su.user_id) r
+    WHERE scope.organization_id IS NOT NULL
+    GROUP BY su.day, scope.organization_id, r.register
+    RETURNING 1
+  )
+  SELECT MAX(c.id) INTO rebuilt_through FROM cleared c;
+
+  PERFORM public.merge_volunteer_sketch_updates();
+  PERFORM public.write_site_statistics_from_counters(rebuilt_through);
+
+  RETURN QUERY SELECT * FROM public.get_all_site_statistics();
+END;
+$$;
+
+-- Estimated distinct volunteers between two UTC days (inclusive), site-wide or for one organization
+CREATE OR REPLACE FUNCTION public.estimate_active_volunteers(
+  p_start DATE,
+  p_end DATE,
+  p_organization_id UUID DEFAULT NULL
+)
+RETURNS INTEGER
+LANGUAGE sql
+STABLE
+SECURITY DEFINER
+SET search_path = public
+AS $$
+  WITH merged AS (
+    SELECT i.register, MAX(get_byte(s.registers, i.register)) AS rank
+    FROM public.site_stats_daily_volunteer_sketches s
+    CROSS JOIN generate_series(0, 2047) AS i(register)
+    WHERE s.day BETWEEN p_start AND p_end
+      AND s.organization_id = COALESCE(p_organization_id, '00000000-0000-0000-0000-000000000000'::UUID)
+    GROUP BY i.register
+  ),
+  summary AS (
+    SELECT
+      COUNT(*) AS registers,
+      COUNT(*) FILTER (WHERE m.rank = 0) AS zeros,
+      0.7213 / (1 + 1.079 / 2048) * 2048 * 2048 / SUM(power(2::FLOAT8, -m.rank)) AS raw
+    FROM merged m
+  )
+  SELECT CASE
+    WHEN registers = 0 THEN 0
+    -- Linear counting is more accurate while many registers are still empty
+    WHEN raw <= 2.5 * 2048 AND zeros > 0 THEN ROUND(2048 * ln(2048.0 / zeros))
+    ELSE ROUND(raw)
+  END::INTEGER
+  FROM summary;
+$$;
+
+-- Window statistics can use the sketches instead of counting distinct volunteers exactly
+DROP FUNCTION IF EXISTS public.get_site_statistics_for_period(DATE, DATE);
+CREATE OR REPLACE FUNCTION public.get_site_statistics_for_period(
+  p_start DATE,
+  p_end DATE,
+  p_approximate BOOLEAN DEFAULT false
+)
+RETURNS TABLE(
+  signups INTEGER,
+  active_volunteers INTEGER,
+  hours_contributed INTEGER,
+  partner_organizations INTEGER
+)
+LANGUAGE sql
+STABLE
+SECURITY DEFINER
+SET search_path = public
+AS $$
+  SELECT
+    COALESCE(SUM(de.signups), 0)::INTEGER,
+    CASE
+      WHEN p_approximate THEN public.estimate_active_volunteers(p_start, p_end)
+      ELSE (
+        SELECT COUNT(DISTINCT dv.user_id)
+        FROM public.site_stats_daily_volunteers dv
+        WHERE dv.day BETWEEN p_start AND p_end
+      )::INTEGER
+    END,
+    COALESCE(SUM(de.signups::BIGINT * e.duration_hours), 0)::INTEGER,
+    COUNT(DISTINCT e.organization_id)::INTEGER
+  FROM public.site_stats_daily_events de
+  JOIN public.events e ON e.id = de.event_id
+  WHERE de.day BETWEEN p_start AND p_end;
+$$;
+
+REVOKE EXECUTE ON FUNCTION public.merge_volunteer_sketch_updates() FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION public.fold_site_statistics() FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION public.rebuild_site_statistics() FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.estimate_active_volunteers(DATE, DATE, UUID) TO anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.get_site_statistics_for_period(DATE, DATE, BOOLEAN) TO anon, authenticated;
+
+-- Build the sketches for the existing signups
+SELECT public.rebuild_site_statistics();
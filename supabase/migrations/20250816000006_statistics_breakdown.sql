@@ -0,0 +1,145 @@
+-- Per-organization and per-event statistics breakdown
+-- One GROUP BY over user_events answers every organization (or event) at once, and the result
+-- is cached until user_events, events or organizations change.
+--
+-- Writes bump a version number rather than deleting cache rows, so a breakdown computed while a
+-- change was committing is stored under the old version and never served.
+
+CREATE TABLE IF NOT EXISTS public.site_stats_breakdown_version (
+  id BOOLEAN NOT NULL PRIMARY KEY DEFAULT true CHECK (id),
+  version BIGINT NOT NULL DEFAULT 0
+);
+
+INSERT INTO public.site_stats_breakdown_version (id, version)
+VALUES (true, 0)
+ON CONFLICT (id) DO NOTHING;
+
+-- The whole breakdown per grouping; sorting and limits are applied when reading
+CREATE TABLE IF NOT EXISTS public.site_stats_breakdown_cache (
+  group_by TEXT NOT NULL PRIMARY KEY,
+  version BIGINT NOT NULL,
+  rows JSONB NOT NULL,
+  computed_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now()
+);
+
+ALTER TABLE public.site_stats_breakdown_version ENABLE ROW LEVEL SECURITY;
+ALTER TABLE public.site_stats_breakdown_cache ENABLE ROW LEVEL SECURITY;
+
+CREATE OR REPLACE FUNCTION public.invalidate_site_statistics_breakdown()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+BEGIN
+  UPDATE public.site_stats_breakdown_version SET version = version + 1 WHERE id;
+  RETURN NULL;
+END;
+$$;
+
+-- Statement-level, so a bulk change bumps the version once
+DROP TRIGGER IF EXISTS invalidate_site_statistics_breakdown ON public.user_events;
+CREATE TRIGGER invalidate_site_statistics_breakdown
+  AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON public.user_events
+  FOR EACH STATEMENT
+  EXECUTE FUNCTION public.invalidate_site_statistics_breakdown();
+
+DROP TRIGGER IF EXISTS invalidate_site_statistics_breakdown ON public.events;
+CREATE TRIGGER invalidate_site_statistics_breakdown
+  AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON public.events
+  FOR EACH STATEMENT
+  EXECUTE FUNCTION public.invalidate_site_statistics_breakdown();
+
+DROP TRIGGER IF EXISTS invalidate_site_statistics_breakdown ON public.organizations;
+CREATE TRIGGER invalidate_site_statistics_breakdown
+  AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON public.organizations
+  FOR EACH STATEMENT
+  EXECUTE FUNCTION public.invalidate_site_statistics_breakdown();
+
+-- Signups, hours and distinct volunteers per organization or per event, largest first by p_sort
+CREATE OR REPLACE FUNCTION public.get_site_statistics_breakdown(
+  p_group_by TEXT DEFAULT 'organization',
+  p_sort TEXT DEFAULT 'signups',
+  p_limit INTEGER DEFAULT 10
+)
+RETURNS JSONB
+LANGUAGE plpgsql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+DECLARE
+  current_version BIGINT;
+  breakdown JSONB;
+BEGIN
+  IF p_group_by NOT IN ('organization', 'event') THEN
+    RAISE EXCEPTION 'Invalid group_by: %', p_group_by;
+  END IF;
+
+  IF p_sort NOT IN ('signups', 'hours', 'volunteers') THEN
+    RAISE EXCEPTION 'Invalid sort: %', p_sort;
+  END IF;
+
+  SELECT v.version INTO current_version FROM public.site_stats_breakdown_version v;
+
+  SELECT c.rows INTO breakdown
+  FROM public.site_stats_breakdown_cache c
+  WHERE c.group_by = p_group_by AND c.version = current_version;
+
+  IF breakdown IS NULL THEN
+    IF p_group_by = 'organization' THEN
+      SELECT COALESCE(jsonb_agg(jsonb_build_object(
+        'organization_id', g.organization_id,
+        'name', o.name,
+        'signups', g.signups,
+        'hours', g.hours,
+        'volunteers', g.volunteers
+      )), '[]'::JSONB)
+      INTO breakdown
+      FROM (
+        SELECT e.organization_id, COUNT(*) AS signups, SUM(e.duration_hours) AS hours, COUNT(DISTINCT ue.user_id) AS volunteers
+        FROM public.user_events ue
+        JOIN public.events e ON e.id = ue.event_id
+        WHERE e.organization_id IS NOT NULL
+        GROUP BY e.organization_id
+      ) g
+      LEFT JOIN public.organizations o ON o.id = g.organization_id;
+    ELSE
+      SELECT COALESCE(jsonb_agg(jsonb_build_object(
+        'event_id', e.id,
+        'title', e.title,
+        'organization_id', e.organization_id,
+        'signups', g.signups,
+        'hours', g.signups * e.duration_hours,
+        'volunteers', g.volunteers
+      )), '[]'::JSONB)
+      INTO breakdown
+      FROM (
+        SELECT ue.event_id, COUNT(*) AS signups, COUNT(DISTINCT ue.user_id) AS volunteers
+        FROM public.user_events ue
+        GROUP BY ue.event_id
+      ) g
+      JOIN public.events e ON e.id = g.event_id;
+    END IF;
+
+    INSERT INTO public.site_stats_breakdown_cache AS c (group_by, version, rows, computed_at)
+    VALUES (p_group_by, current_version, breakdown, now())
+    ON CONFLICT (group_by) DO UPDATE
+    SET version = EXCLUDED.version, rows = EXCLUDED.rows, computed_at = EXCLUDED.computed_at
+    WHERE c.version <= EXCLUDED.version;
+  END IF;
+
+  RETURN (
+    SELECT COALESCE(jsonb_agg(r.item ORDER BY (r.item ->> p_sort)::BIGINT DESC), '[]'::JSONB)
+    FROM (
+      SELECT item
+      FROM jsonb_array_elements(breakdown) AS item
+      ORDER BY (item ->> p_sort)::BIGINT DESC
+      LIMIT p_limit
+    ) r
+  );
+END;
+$$;
+
+-- Breakdowns are served through api/site-statistics.py
+REVOKE EXECUTE ON FUNCTION public.get_site_statistics_breakdown(TEXT, TEXT, INTEGER) FROM PUBLIC, anon;
+GRANT EXECUTE ON FUNCTION public.get_site_statistics_breakdown(TEXT, TEXT, INTEGER) TO authenticated;
@@ -0,0 +1,38 @@
+-- Update several site_stats values in one statement
+-- p_updates is a JSON array of {stat_type, confirmed_total?, current_estimate?}; omitted values
+-- are left unchanged. Returns every site_stats row as it is after the update, so callers can
+-- answer without reading the table again.
+-- If any stat_type has no row the caller may update, no_data_found is raised and nothing is written.
+
+CREATE OR REPLACE FUNCTION public.update_site_stats(p_updates JSONB)
+RETURNS SETOF public.site_stats
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  v_missing TEXT;
+BEGIN
+  WITH updated AS (
+    UPDATE public.site_stats s
+    SET
+      confirmed_total = COALESCE(u.confirmed_total, s.confirmed_total),
+      current_estimate = COALESCE(u.current_estimate, s.current_estimate),
+      updated_at = now()
+    FROM jsonb_to_recordset(p_updates) AS u(stat_type TEXT, confirmed_total INTEGER, current_estimate INTEGER)
+    WHERE s.stat_type = u.stat_type
+    RETURNING s.stat_type
+  )
+  SELECT string_agg(DISTINCT u.stat_type, ', ') INTO v_missing
+  FROM jsonb_to_recordset(p_updates) AS u(stat_type TEXT)
+  WHERE u.stat_type NOT IN (SELECT updated.stat_type FROM updated);
+
+  -- Raising rolls back the rows already updated above
+  IF v_missing IS NOT NULL THEN
+    RAISE EXCEPTION 'Statistic not found: %', v_missing USING ERRCODE = 'no_data_found';
+  END IF;
+
+  RETURN QUERY SELECT * FROM public.site_stats;
+END;
+$$;
+
+-- Runs with the caller's rights, so the site_stats update policies still apply
+GRANT EXECUTE ON FUNCTION public.update_site_stats(JSONB) TO authenticated;
@@ -0,0 +1,23 @@
+-- Mark a chunk of notifications as sent in one statement
+-- The chat notification worker used to call mark_notification_sent and commit once per
+-- notification. Returns the ids that were updated, so the caller can report per notification.
+
+CREATE OR REPLACE FUNCTION public.mark_notifications_sent(p_notification_ids UUID[])
+RETURNS SETOF UUID
+LANGUAGE sql
+SECURITY DEFINER
+SET search_path = public
+AS $$
+  UPDATE public.notifications
+  SET
+    email_sent = true,
+    sent_at = now()
+  WHERE id = ANY(p_notification_ids)
+  RETURNING id;
+$$;
+
+-- Only the email service marks notifications as sent
+REVOKE EXECUTE ON FUNCTION public.mark_notifications_sent(UUID[]) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.mark_notifications_sent(UUID[]) TO service_role;
+
+COMMENT ON FUNCTION public.mark_notifications_sent(UUID[]) IS 'Mark notifications as sent and record the sent timestamp, returning the ids that were updated';
@@ -0,0 +1,25 @@
+-- Live statistics count hours with each event's duration
+-- get_live_statistics still counted every signup as 2 hours, so its numbers disagreed with
+-- site_stats, which sums events.duration_hours per signup since 20250816000003.
+
+CREATE OR REPLACE FUNCTION public.get_live_statistics()
+RETURNS TABLE(
+  active_volunteers INTEGER,
+  hours_contributed INTEGER,
+  partner_organizations INTEGER
+)
+LANGUAGE sql
+STABLE SECURITY DEFINER
+SET search_path = public
+AS $$
+  SELECT
+    -- Actual users only, excluding organizations (same rule as the admin dashboard)
+    (SELECT COUNT(*) FROM public.profiles WHERE user_type != 'organization')::INTEGER,
+    -- Each signup counts its event's duration; signups for deleted events count nothing
+    (
+      SELECT COALESCE(SUM(e.duration_hours), 0)
+      FROM public.user_events ue
+      JOIN public.events e ON e.id = ue.event_id
+    )::INTEGER,
+    (SELECT COUNT(*) FROM public.organizations)::INTEGER;
+$$;